@@ -90,7 +90,7 @@ for person in sorted([p for p in os.listdir(train_dir) if os.path.isdir(os.path.
         print(f"   📊 saved mean embedding ({len(embeddings)} valid)")
 
 with open(output_pkl, 'wb') as f:
-    pickle.dump(database, f)
+    pickle.dump(database, f, protocol=pickle.HIGHEST_PROTOCOL)
 
 print("\n💾 Saved:", output_pkl)
 print("👥 People in DB:", len(database))
@@ -324,7 +324,7 @@ def on_add_button_clicked(b):
         mean_emb = np.mean(embeddings, axis=0)
         database[new_name] = mean_emb
         with open(db_path, 'wb') as f:
-            pickle.dump(database, f)
+            pickle.dump(database, f, protocol=pickle.HIGHEST_PROTOCOL)
         print(f"🎉 Đã thêm '{new_name}' vào DB với {len(embeddings)} ảnh. Tổng người: {len(database)}")
         
         # Reset widget
@@ -0,0 +1,98 @@
+"""
+Xuất model YOLO sang TensorRT engine (INT8) và load engine khi chạy.
+
+Chạy một lần để export:
+    python export_engine.py yolov8s-oiv7.pt best.pt
+
+Thu thập ảnh calibration từ webcam (300–500 frame) vào calib_frames/images:
+    python export_engine.py --capture 400
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+import cv2
+from ultralytics import YOLO
+
+BASE_DIR = Path(__file__).resolve().parent
+CALIB_YAML = BASE_DIR / "calib.yaml"
+CALIB_IMAGES_DIR = BASE_DIR / "calib_frames" / "images"
+
+
+def tensorrt_available():
+    """TensorRT chỉ có trên máy NVIDIA đã cài gói `tensorrt`."""
+    return importlib.util.find_spec("tensorrt") is not None
+
+
+def calibration_ready():
+    """Có ảnh calibration (calib.yaml trỏ tới CALIB_IMAGES_DIR) thì mới export INT8 được."""
+    return CALIB_IMAGES_DIR.is_dir() and any(CALIB_IMAGES_DIR.iterdir())
+
+
+def export_engine(weights, calib=CALIB_YAML, batch=4):
+    """
+    Export `weights` (.pt) sang `.engine` INT8, trả về đường dẫn engine.
+    `batch` là batch tối đa của engine dynamic (đủ cho BATCH tới 4 trong predict.py).
+    """
+    return YOLO(str(weights)).export(
+        format="engine",
+        int8=True,
+        dynamic=True,
+        batch=batch,
+        workspace=4,
+        data=str(calib),
+    )
+
+
+def load_model(weights, calib=CALIB_YAML):
+    """
+    Load engine TensorRT nếu đã có (hoặc export được), ngược lại dùng file .pt.
+    Chỉ tự export khi đã thu thập ảnh calibration, tránh mỗi lần chạy lại
+    build engine vài phút rồi thất bại vì thiếu dữ liệu.
+    """
+    weights = Path(weights)
+    if not weights.is_absolute():
+        weights = BASE_DIR / weights
+    engine = weights.with_suffix(".engine")
+
+    if not engine.exists() and tensorrt_available():
+        if not calibration_ready():
+            print(f"⚠️ Chưa có ảnh calibration trong {CALIB_IMAGES_DIR}, dùng {weights.name}. "
+                  "Thu thập bằng: python export_engine.py --capture 400")
+            return YOLO(str(weights))
+        try:
+            engine = Path(export_engine(weights, calib))
+        except Exception as exc:
+            print(f"⚠️ Export TensorRT thất bại, dùng {weights.name}: {exc}")
+
+    if engine.exists():
+        print(f"Dùng TensorRT engine: {engine.name}")
+        return YOLO(str(engine), task="detect")
+    return YOLO(str(weights))
+
+
+def capture_calibration_frames(count=400, camera=0):
+    """Lưu `count` frame webcam làm dữ liệu calibration INT8."""
+    CALIB_IMAGES_DIR.mkdir(parents=True, exist_ok=True)
+    cap = cv2.VideoCapture(camera)
+    if not cap.isOpened():
+        raise SystemExit("Lỗi mở webcam")
+    saved = 0
+    while saved < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        cv2.imwrite(str(CALIB_IMAGES_DIR / f"frame_{saved:04d}.jpg"), frame)
+        saved += 1
+    cap.release()
+    print(f"Đã lưu {saved} frame vào {CALIB_IMAGES_DIR}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] == ["--capture"]:
+        capture_calibration_frames(int(args[1]) if len(args) > 1 else 400)
+    else:
+        for path in args or ["yolov8s-oiv7.pt", "best.pt"]:
+            print("Đã export:", export_engine(BASE_DIR / path))
@@ -1,7 +1,22 @@
-from ultralytics import YOLO
+import queue
+import threading
+
 import cv2
+import torch
+
+from export_engine import load_model
+
+# Dùng TensorRT INT8 engine nếu có (export một lần bằng export_engine.py)
+model = load_model("yolov8s-oiv7.pt")
 
-model = YOLO(model="yolov8s-oiv7.pt")
+# Không có TensorRT: chạy FP16 trên GPU (Volta+) và gộp Conv+BN một lần
+predict_kwargs = {"conf": 0.3, "verbose": False, "imgsz": 640}
+if torch.cuda.is_available():
+    predict_kwargs.update(half=True, device=0)
+    try:
+        model.fuse()
+    except TypeError:
+        pass  # engine TensorRT đã được tối ưu sẵn, không fuse được
 
 cap = cv2.VideoCapture(0)
 
@@ -12,26 +27,134 @@ if not cap.isOpened():
 # Thêm dòng này để set độ phân giải (giúp nhiều máy fix xanh)
 cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
 cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+# Chỉ giữ 1 frame trong buffer để luôn xử lý frame mới nhất (giảm độ trễ)
+cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+# MJPG giúp camera tự nén, giảm tải decode trên CPU
+cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
 
 print("Webcam đã mở – Nhấn 'q' để thoát")
 
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        print("Lỗi đọc frame")
-        break
+# Chỉ chạy YOLO mỗi SKIP frame; các frame ở giữa dùng tracker MedianFlow
+# (cần opencv-contrib-python). Không có tracker thì giữ nguyên box cũ.
+SKIP = 3
+# Số frame YOLO gộp vào một lần forward. Mặc định 1 cho webcam realtime:
+# với BATCH=N phải chờ đủ N*SKIP frame (~N*SKIP/30 giây ở 30 FPS) mới chạy
+# YOLO, rồi cả chunk được hiển thị dồn một lúc -> trễ và giật hình.
+# Tăng BATCH chỉ có lợi khi cần thông lượng GPU (video file) chứ không cần độ trễ thấp.
+BATCH = 1
+HAS_TRACKER = hasattr(cv2, "legacy") and hasattr(cv2.legacy, "MultiTracker_create")
+BOX_COLOR = (0, 255, 0)
+
+
+# Pipeline 3 tầng: đọc camera -> YOLO -> hiển thị, nối bằng queue giới hạn
+# để frame kế tiếp được đọc trong lúc batch hiện tại đang chạy YOLO.
+# Hiển thị phải ở main thread (HighGUI trên macOS không chạy ở thread khác).
+frame_queue = queue.Queue(maxsize=BATCH * SKIP)
+display_queue = queue.Queue(maxsize=2)
+stop_event = threading.Event()
+
+
+def put_until_stopped(q, item):
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def read_frames():
+    idx = 0
+    while not stop_event.is_set():
+        ret, frame = cap.read()
+        if not ret:
+            print("Lỗi đọc frame")
+            break
+        # Fix xanh lè trên một số máy: flip frame
+        frame = cv2.flip(frame, 1)  # lật ngang (mirror)
+        put_until_stopped(frame_queue, (idx, frame))
+        idx += 1
+    put_until_stopped(frame_queue, None)
 
-    # Fix xanh lè trên một số máy: flip frame
-    frame = cv2.flip(frame, 1)  # lật ngang (mirror)
 
-    # Predict
-    results = model(frame, conf=0.3, verbose=False)[0]
-    annotated_frame = results.plot()
+def init_tracks(frame, results):
+    boxes, labels = [], []
+    for box in results.boxes:
+        x1, y1, x2, y2 = box.xyxy[0].tolist()
+        boxes.append((x1, y1, x2 - x1, y2 - y1))
+        labels.append(f"{results.names[int(box.cls[0])]} {float(box.conf[0]):.2f}")
+    tracker = None
+    if HAS_TRACKER and boxes:
+        tracker = cv2.legacy.MultiTracker_create()
+        for bbox in boxes:
+            tracker.add(cv2.legacy.TrackerMedianFlow_create(), frame, bbox)
+    return tracker, boxes, labels
+
+
+def draw_tracks(frame, boxes, labels):
+    for (x, y, w, h), label in zip(boxes, labels):
+        x, y, w, h = int(x), int(y), int(w), int(h)
+        cv2.rectangle(frame, (x, y), (x + w, y + h), BOX_COLOR, 2)
+        cv2.putText(frame, label, (x, max(0, y - 6)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, BOX_COLOR, 2)
+    return frame
+
+
+def collect_chunk():
+    """
+    Gom frame liên tiếp cho tới khi đủ BATCH frame cần chạy YOLO.
+    Trả về (chunk, hết_camera).
+    """
+    chunk, pending = [], 0
+    while pending < BATCH:
+        item = frame_queue.get()
+        if item is None:
+            return chunk, True
+        chunk.append(item)
+        if item[0] % SKIP == 0:
+            pending += 1
+    return chunk, False
+
+
+def run_inference():
+    tracker, boxes, labels = None, [], []
+    finished = False
+    while not finished:
+        chunk, finished = collect_chunk()
+        # Gộp các frame cần YOLO thành 1 lần forward (batch) để tận dụng GPU
+        yolo_frames = [frame for idx, frame in chunk if idx % SKIP == 0]
+        batch_results = iter(model(yolo_frames, **predict_kwargs) if yolo_frames else [])
+        for idx, frame in chunk:
+            if idx % SKIP == 0:
+                results = next(batch_results)
+                annotated_frame = results.plot()
+                tracker, boxes, labels = init_tracks(frame, results)
+            else:
+                if tracker is not None:
+                    ok, tracked = tracker.update(frame)
+                    if ok:
+                        boxes = tracked
+                annotated_frame = draw_tracks(frame, boxes, labels)
+            put_until_stopped(display_queue, annotated_frame)
+    put_until_stopped(display_queue, None)
+
+
+reader = threading.Thread(target=read_frames, daemon=True)
+worker = threading.Thread(target=run_inference, daemon=True)
+reader.start()
+worker.start()
+
+while True:
+    annotated_frame = display_queue.get()
+    if annotated_frame is None:
+        break
 
     cv2.imshow("Phát hiện điện thoại & tai nghe", annotated_frame)
 
     if cv2.waitKey(1) & 0xFF == ord('q'):
         break
 
+stop_event.set()
+reader.join(timeout=1.0)
 cap.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+cv2.destroyAllWindows()
@@ -1,8 +1,9 @@
-from ultralytics import YOLO
 import cv2
 
-# Load model đã train
-model = YOLO("best.pt")  # đặt file best.pt cùng folder hoặc sửa đường dẫn đầy đủ
+from export_engine import load_model
+
+# Load model đã train (ưu tiên best.engine TensorRT INT8 nếu đã export)
+model = load_model("best.pt")  # đặt file best.pt cùng folder hoặc sửa đường dẫn đầy đủ
 
 # Test 1 ảnh
 results = model("IMG_1655.jpg", conf=0.3)[0]  # thay "test.jpg" bằng ảnh của bạn
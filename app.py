@@ -4,44 +4,150 @@ Flask entry-point exposing the cheating detection pipeline as a REST API.
 
 from __future__ import annotations
 
+import os
+
+# Cap BLAS/OpenMP pools before numpy, OpenCV and torch are imported: every
+# gunicorn worker and request thread otherwise spawns one thread per core.
+DEFAULT_NUM_THREADS = 2
+for _var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+    os.environ.setdefault(_var, str(DEFAULT_NUM_THREADS))
+
 import logging
 import re
-import uuid
+import secrets
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
+from statistics import fmean
 from typing import Any, Dict
 
 import cv2
-import numpy as np
-from flask import Flask, jsonify, request, url_for
+import orjson
+from flask import Flask, g, jsonify, request
+from flask.json.provider import JSONProvider
 
-from cheating_detection import annotate_detections, load_default_pipeline
+from cheating_detection import (
+    CheatingDetectionPipeline,
+    load_default_pipeline,
+)
+from cheating_detection.batching import MicroBatcher
 from cheating_detection.utils import (
     decode_image_from_base64,
-    decode_image_from_bytes,
+    decode_image_from_stream,
+    resize_to_max_dimension,
 )
-from database import mysql_service, s3_service
-
-
-def convert_numpy_to_json_serializable(obj):
-    """Recursively convert numpy arrays to lists for JSON serialization."""
-    if isinstance(obj, np.ndarray):
-        return obj.tolist()
-    elif isinstance(obj, dict):
-        return {k: convert_numpy_to_json_serializable(v) for k, v in obj.items()}
-    elif isinstance(obj, (list, tuple)):
-        return [convert_numpy_to_json_serializable(item) for item in obj]
-    elif isinstance(obj, (np.integer, np.floating)):
-        return obj.item()
-    else:
-        return obj
+from database import get_s3_service, mysql_service
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    JSON provider backed by orjson, which serializes numpy arrays and
+    scalars natively so results can be returned without converting them.
+    """
+
+    option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj, option=self.option).decode()
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
 
 LOGGER = logging.getLogger(__name__)
 
 app = Flask(__name__)
-PIPELINE = load_default_pipeline()
+app.json = OrjsonProvider(app)
+# Requests are already parallel across threads; OpenCV's own pool only adds
+# context switches on top of them.
+cv2.setNumThreads(1)
+try:
+    import torch
+
+    # Let cuDNN pick the fastest convolution kernels for the YOLO input shapes
+    torch.backends.cudnn.benchmark = True
+    try:
+        _num_threads = int(os.environ["OMP_NUM_THREADS"])
+    except ValueError:
+        _num_threads = 0
+    if _num_threads < 1:
+        LOGGER.warning(
+            "Invalid OMP_NUM_THREADS=%r, using %d torch threads",
+            os.environ["OMP_NUM_THREADS"],
+            DEFAULT_NUM_THREADS,
+        )
+        _num_threads = DEFAULT_NUM_THREADS
+    torch.set_num_threads(_num_threads)
+except ImportError:  # pragma: no cover - torch ships with ultralytics
+    pass
+
+# The pipeline is built on first use (see gunicorn.conf.py) so that every
+# worker process creates its own CUDA context instead of inheriting one
+# across fork().
+_PIPELINE: CheatingDetectionPipeline | None = None
+_PIPELINE_INIT_LOCK = threading.Lock()
+# YOLO and MediaPipe models are not thread-safe: inference is serialised per
+# worker while decoding, MySQL and S3 work of other requests run concurrently.
+PIPELINE_LOCK = threading.Lock()
 ANNOTATED_DIR = Path(app.static_folder) / "annotated"
 ANNOTATED_DIR.mkdir(parents=True, exist_ok=True)
+# URL path (relative to the app root) under which ANNOTATED_DIR is served
+ANNOTATED_URL_PATH = f"{app.static_url_path.strip('/')}/annotated/"
+# Background workers for annotated-image encoding and disk writes so the
+# request thread can respond as soon as inference is done (S3 uploads run on
+# the S3 service's own upload threads).
+EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="persist")
+# Annotated frames are debugging evidence, quality 85 is plenty and keeps
+# libjpeg-turbo on its fast baseline (non-optimized, non-progressive) path.
+JPEG_ENCODE_PARAMS = [
+    int(cv2.IMWRITE_JPEG_QUALITY), 85,
+    int(cv2.IMWRITE_JPEG_PROGRESSIVE), 0,
+    int(cv2.IMWRITE_JPEG_OPTIMIZE), 0,
+]
+# Monitor frames larger than this (longest side, px) are downscaled before
+# inference; the detectors run at 640 px so extra resolution is wasted work.
+MAX_MONITOR_DIMENSION = 960
+
+
+def get_pipeline() -> CheatingDetectionPipeline:
+    """
+    Return the process-wide pipeline, building and warming it up once.
+    """
+    global _PIPELINE
+    if _PIPELINE is None:
+        with _PIPELINE_INIT_LOCK:
+            if _PIPELINE is None:
+                pipeline = load_default_pipeline()
+                try:
+                    pipeline.warmup()
+                except Exception:  # pragma: no cover - defensive
+                    LOGGER.warning("Pipeline warm-up failed", exc_info=True)
+                _PIPELINE = pipeline
+    return _PIPELINE
+
+
+def _analyze_batch(images):
+    with PIPELINE_LOCK:
+        return get_pipeline().analyze_batch(images)
+
+
+# /api/monitor frames from concurrent students are coalesced into batches of
+# up to 8 collected over at most 50 ms, so YOLO runs once per batch.
+MONITOR_BATCHER = MicroBatcher(
+    _analyze_batch, max_batch_size=8, max_wait=0.05, name="monitor-batcher"
+)
+# Upper bound on waiting for a batched result (queueing + inference).
+MONITOR_RESULT_TIMEOUT = 10.0
+# Violations detected within the same 50 ms window (up to 64) are written in
+# one transaction together with their summary updates.
+VIOLATION_WRITER = MicroBatcher(
+    mysql_service.insert_violations_bulk,
+    max_batch_size=64,
+    max_wait=0.05,
+    name="violation-writer",
+)
 
 
 @app.route("/health", methods=["GET"])
@@ -52,27 +158,25 @@ def health() -> Any:
 @app.route("/api/detect", methods=["POST"])
 def detect() -> Any:
 
-    payload = request.get_json(silent=True) if request.is_json else None
+    payload = _payload() if request.is_json else None
     try:
         image = _extract_image_payload(payload)
     except ValueError as exc:
         return jsonify({"error": str(exc)}), 400
 
     try:
-        result = PIPELINE.analyze(image)
+        with PIPELINE_LOCK:
+            result = get_pipeline().analyze(image)
     except Exception as exc:  # pragma: no cover - defensive
         LOGGER.exception("Cheating detection failed")
         return jsonify({"error": "Internal detection failure"}), 500
 
-    try:
-        annotated = annotate_detections(image, result)
-        filename = _persist_annotated_image(annotated)
-        result["annotated_image_url"] = url_for(
-            "static", filename=f"annotated/{filename}", _external=True
-        )
-    except ValueError as exc:
-        LOGGER.warning("Failed to persist annotated image: %s", exc)
-    return convert_numpy_to_json_serializable(result)
+    # analyze() already drew the detections; keep the frame out of the response
+    annotated_image = result.pop("annotated_image", image)
+    filename = _persist_annotated_image(annotated_image)
+    # Built directly instead of url_for() to skip the routing lookup
+    result["annotated_image_url"] = f"{request.url_root}{ANNOTATED_URL_PATH}{filename}"
+    return result
 
 
 def _extract_image_payload(payload: Dict[str, Any] | None = None):
@@ -83,10 +187,10 @@ def _extract_image_payload(payload: Dict[str, Any] | None = None):
         file_storage = request.files.get("file")
         if not file_storage or not file_storage.filename:
             raise ValueError("Missing uploaded file")
-        return decode_image_from_bytes(file_storage.read())
+        return decode_image_from_stream(file_storage.stream)
 
     if payload is None and request.is_json:
-        payload = request.get_json() or {}
+        payload = _payload()
     if payload:
         if "image_base64" in payload:
             return decode_image_from_base64(payload["image_base64"])
@@ -120,26 +224,14 @@ def monitor_exam() -> Any:
         exam_period_id = _extract_field("exam_period_id", required=True, field_type=int)
         submission_id = _extract_field("submission_id", required=True, field_type=int)
         
-        # Query MySQL to get user_id from users table where employee_code = student_id
+        # Get user_id from users table where employee_code = student_id
         try:
-            conn = mysql_service._get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute( 
-                "SELECT id FROM users WHERE employee_code = %s LIMIT 1",
-                (student_id,)
-            )
-            result = cursor.fetchone()
-            cursor.close()
-            
-            if not result:
-                return jsonify({
-                    "error": f"Học sinh với mã '{student_id}' không tìm thấy"
-                }), 404
-            
-            user_id = result['id']
+            user_id = _lookup_user_id(student_id)
             LOGGER.info(f"Found user_id {user_id} for student_id '{student_id}'")
-            
+        except LookupError:
+            return jsonify({
+                "error": f"Học sinh với mã '{student_id}' không tìm thấy"
+            }), 404
         except Exception as e:
             LOGGER.error(f"Failed to lookup user_id for student_id '{student_id}': {e}")
             return jsonify({"error": "Database error while looking up student"}), 500
@@ -148,16 +240,19 @@ def monitor_exam() -> Any:
         return jsonify({"error": str(exc)}), 400
     
     # Extract image
-    images = _extract_images()
+    images = _extract_images(max_dimension=MAX_MONITOR_DIMENSION)
     if not images:
         return jsonify({"error": "Image is required for monitoring"}), 400
     
     image = images[0]
     
     try:
-        # Run detection pipeline
-        result = PIPELINE.analyze(image)
+        # Run detection pipeline (batched with other concurrent monitor requests)
+        result = MONITOR_BATCHER.submit(image).result(timeout=MONITOR_RESULT_TIMEOUT)
         detected_at = datetime.now()
+        # Detach the annotated frame once; the remaining dict is stored and
+        # returned as-is
+        annotated_image = result.pop("annotated_image", image)
         
         # Check if there are any violations
         has_violation = result.get("status") != "clear"
@@ -170,50 +265,48 @@ def monitor_exam() -> Any:
             # Calculate confidence (average from detection results)
             confidence = _calculate_confidence(result)
             
-            # Get annotated image (with bounding boxes, landmarks, gaze arrows)
-            annotated_image = result.get("annotated_image", image)
-            
-            # Upload annotated image to S3 (only if violation)
-            image_url, image_key = s3_service.upload_violation_image(
-                image_bgr=annotated_image,
-                exam_period_id=exam_period_id,
-                submission_id=submission_id,
-                user_id=user_id,
-                violation_type=violation_type
-            )
-            print(f"Uploaded violation image to S3: {image_url} (key: {image_key})")
-            
-            # Remove annotated_image and convert numpy arrays to lists
-            detection_data = {k: v for k, v in result.items() if k != "annotated_image"}
-            detection_data = convert_numpy_to_json_serializable(detection_data)
-            
-            # Save violation to MySQL
-            violation_id = mysql_service.insert_violation(
-                exam_period_id=exam_period_id,
-                submission_id=submission_id,
-                user_id=user_id,
-                violation_type=violation_type,
-                severity=severity,
-                confidence=confidence,
-                image_url=image_url,
-                image_key=image_key,
-                detection_data=detection_data,
-                detected_at=detected_at
-            )
-            
-            # Update violation summary
-            if violation_id:
-                mysql_service.update_violation_summary(
+            # Reserve the S3 key now and upload in the background (only if
+            # violation and S3 is configured)
+            s3_service = get_s3_service()
+            image_url = image_key = upload = None
+            if s3_service.s3_client is not None:
+                image_url, image_key = s3_service.build_violation_key(
+                    exam_period_id=exam_period_id,
                     submission_id=submission_id,
                     user_id=user_id,
+                    violation_type=violation_type
+                )
+                upload = s3_service.upload_violation_image_async(
+                    image_bgr=annotated_image,
                     exam_period_id=exam_period_id,
-                    severity=severity,
-                    detected_at=detected_at
+                    submission_id=submission_id,
+                    user_id=user_id,
+                    violation_type=violation_type,
+                    s3_key=image_key
                 )
+                LOGGER.info("Queued violation image upload to S3: %s", image_key)
             
-            # Prepare response (remove annotated_image and convert numpy)
-            response_result = {k: v for k, v in result.items() if k != "annotated_image"}
-            response_result = convert_numpy_to_json_serializable(response_result)
+            # Save violation and update its summary in MySQL (batched)
+            violation_id = VIOLATION_WRITER.submit((
+                exam_period_id,
+                submission_id,
+                user_id,
+                violation_type,
+                severity,
+                confidence,
+                image_url,
+                image_key,
+                app.json.dumps(result),
+                detected_at
+            )).result(timeout=MONITOR_RESULT_TIMEOUT)
+            if upload is not None:
+                # Attached once the row exists, so a failed upload can always
+                # NULL the reserved URL (runs right away if already finished)
+                upload.add_done_callback(
+                    lambda future, key=image_key: _clear_failed_upload(future, key)
+                )
+                if upload.done() and upload.result()[1] is None:
+                    image_url = None
             
             return jsonify({
                 "status": "violation_detected",
@@ -225,18 +318,15 @@ def monitor_exam() -> Any:
                 "flags": flags,
                 "image_url": image_url,
                 "detected_at": detected_at.isoformat(),
-                "detection_result": response_result
+                "detection_result": result
             }), 200
         else:
             # No violation - return success without saving
-            response_result = {k: v for k, v in result.items() if k != "annotated_image"}
-            response_result = convert_numpy_to_json_serializable(response_result)
-            
             return jsonify({
                 "student_id": student_id,
                 "status": "clear",
                 "message": "No violations detected",
-                "detection_result": response_result
+                "detection_result": result
             }), 200
             
     except Exception as exc:  # pragma: no cover - defensive
@@ -264,7 +354,7 @@ def register_student() -> Any:
         email = _extract_email()  # Optional
         
         # Check if student_id already exists
-        existing_name = PIPELINE.face_recognizer.database.find_by_student_id(student_id)
+        existing_name = get_pipeline().face_recognizer.database.find_by_student_id(student_id)
         if existing_name:
             return jsonify({
                 "error": f"Học sinh có mã '{student_id}' đã được đăng ký với tên '{existing_name}'"
@@ -282,12 +372,13 @@ def register_student() -> Any:
 
 
     try:
-        summary = PIPELINE.face_recognizer.add_person(
-            name, 
-            images,
-            student_id=student_id,
-            email=email
-        )
+        with PIPELINE_LOCK:
+            summary = get_pipeline().face_recognizer.add_person(
+                name, 
+                images,
+                student_id=student_id,
+                email=email
+            )
     except ValueError as exc:
         return jsonify({"error": str(exc)}), 400
     except Exception:  # pragma: no cover - defensive
@@ -296,7 +387,7 @@ def register_student() -> Any:
 
     summary["student_id"] = student_id
     summary["email"] = email
-    summary["total_students"] = len(PIPELINE.face_recognizer.database.people)
+    summary["total_students"] = len(get_pipeline().face_recognizer.database.people)
     return jsonify(summary), 201
 
 
@@ -309,7 +400,7 @@ def get_all_students() -> Any:
         List of students with their metadata (name, student_id, email, registration_date)
     """
     try:
-        students = PIPELINE.face_recognizer.database.get_all_students()
+        students = get_pipeline().face_recognizer.database.get_all_students()
         return jsonify({
             "total": len(students),
             "students": students
@@ -332,18 +423,19 @@ def delete_student(identifier: str) -> Any:
     """
     try:
         # Try to find by student_id first
-        name = PIPELINE.face_recognizer.database.find_by_student_id(identifier)
+        name = get_pipeline().face_recognizer.database.find_by_student_id(identifier)
         if not name:
             # If not found, treat identifier as name
             name = identifier
         
-        success = PIPELINE.face_recognizer.database.delete_person(name)
+        with PIPELINE_LOCK:
+            success = get_pipeline().face_recognizer.database.delete_person(name)
         if not success:
             return jsonify({"error": f"Student '{identifier}' not found"}), 404
         
         return jsonify({
             "message": f"Student '{name}' deleted successfully",
-            "total_students": len(PIPELINE.face_recognizer.database.people)
+            "total_students": len(get_pipeline().face_recognizer.database.people)
         }), 200
     except Exception:  # pragma: no cover - defensive
         LOGGER.exception("Failed to delete student")
@@ -363,15 +455,15 @@ def get_student_info(identifier: str) -> Any:
     """
     try:
         # Try to find by student_id first
-        name = PIPELINE.face_recognizer.database.find_by_student_id(identifier)
+        name = get_pipeline().face_recognizer.database.find_by_student_id(identifier)
         if not name:
             # If not found, treat identifier as name
             name = identifier
         
-        if not PIPELINE.face_recognizer.database.has_person(name):
+        if not get_pipeline().face_recognizer.database.has_person(name):
             return jsonify({"error": f"Student '{identifier}' not found"}), 404
         
-        metadata = PIPELINE.face_recognizer.database.get_student_info(name)
+        metadata = get_pipeline().face_recognizer.database.get_student_info(name)
         return jsonify({
             "name": name,
             **metadata
@@ -410,7 +502,7 @@ def verify_student() -> Any:
     # Extract optional threshold
     threshold = None
     if request.is_json:
-        payload = request.get_json() or {}
+        payload = _payload()
         threshold = payload.get("threshold")
     elif request.form:
         threshold_str = request.form.get("threshold")
@@ -435,11 +527,12 @@ def verify_student() -> Any:
     image = images[0]
     
     try:
-        result = PIPELINE.face_recognizer.verify_student(
-            student_id=student_id,
-            image_bgr=image,
-            verification_threshold=threshold
-        )
+        with PIPELINE_LOCK:
+            result = get_pipeline().face_recognizer.verify_student(
+                student_id=student_id,
+                image_bgr=image,
+                verification_threshold=threshold
+            )
         
         # Return appropriate status code
         if result["verified"]:
@@ -468,17 +561,27 @@ def add_face() -> Any:
         return jsonify({"error": "At least one image is required"}), 400
 
     try:
-        summary = PIPELINE.face_recognizer.add_person(name, images)
+        with PIPELINE_LOCK:
+            summary = get_pipeline().face_recognizer.add_person(name, images)
     except ValueError as exc:
         return jsonify({"error": str(exc)}), 400
     except Exception:  # pragma: no cover - defensive
         LOGGER.exception("Failed to add identity")
         return jsonify({"error": "Internal error while adding face"}), 500
 
-    summary["total_identities"] = len(PIPELINE.face_recognizer.database.people)
+    summary["total_identities"] = len(get_pipeline().face_recognizer.database.people)
     return jsonify(summary), 201
 
 
+def _payload() -> Dict[str, Any]:
+    """
+    Return the JSON body of the current request, parsed once per request.
+    """
+    if "json_payload" not in g:
+        g.json_payload = request.get_json(silent=True) or {}
+    return g.json_payload
+
+
 def _extract_field(field_name: str, required: bool = True, field_type: type = str):
     """
     Extract a field from request (JSON or form-data).
@@ -497,7 +600,7 @@ def _extract_field(field_name: str, required: bool = True, field_type: type = st
     value = None
     
     if request.is_json:
-        payload = request.get_json() or {}
+        payload = _payload()
         value = payload.get(field_name)
     elif request.form:
         value = request.form.get(field_name)
@@ -519,6 +622,39 @@ def _extract_field(field_name: str, required: bool = True, field_type: type = st
         raise ValueError(f"Invalid value for '{field_name}': expected {field_type.__name__}")
 
 
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+# Hướng nhìn (EyeGazeEstimator) -> loại vi phạm
+_GAZE_VIOLATIONS = {
+    "Looking Up": "Mắt nhìn lên",
+    "Looking Down": "Mắt nhìn xuống",
+    "Looking Left": "Mắt nhìn trái",
+    "Looking Right": "Mắt nhìn phải",
+}
+
+# Hướng đầu (HeadPoseClassifier) -> loại vi phạm
+_HEAD_VIOLATIONS = {
+    "Looking Up": "Đầu ngẩng lên",
+    "Looking Down": "Đầu cúi xuống",
+    "Looking Left": "Đầu quay trái",
+    "Looking Right": "Đầu quay phải",
+}
+
+
+@lru_cache(maxsize=4096)
+def _lookup_user_id(student_id: str) -> int:
+    """
+    Resolve users.id for a student code.
+
+    Cached because the mapping does not change during an exam. Unknown
+    codes raise LookupError so that misses are not cached.
+    """
+    user_id = mysql_service.get_user_id_by_student_code(student_id)
+    if user_id is None:
+        raise LookupError(student_id)
+    return user_id
+
+
 def _classify_violation(result: Dict[str, Any], flags: list) -> tuple[str, str]:
     """
     Phân loại loại vi phạm và mức độ nghiêm trọng dựa trên kết quả phát hiện.
@@ -553,34 +689,20 @@ def _classify_violation(result: Dict[str, Any], flags: list) -> tuple[str, str]:
     if objects:
         return "Phát hiện vật dụng khả nghi", "critical"
     
-    # KHÔNG NGHIÊM TRỌNG: Kiểm tra vi phạm về hướng nhìn/cử động đầu
-    for flag in flags:
-        flag_lower = flag.lower()
-        
-        # Nhìn chỗ khác
-        # Nhìn chỗ khác (Gaze)
-        if "gaze" in flag_lower and "center" not in flag_lower:
-            if "looking up" in flag_lower:
-                return "Mắt nhìn lên", "medium"
-            if "looking down" in flag_lower:
-                return "Mắt nhìn xuống", "medium"
-            if "looking left" in flag_lower:
-                return "Mắt nhìn trái", "medium"
-            if "looking right" in flag_lower:
-                return "Mắt nhìn phải", "medium"
-            return "Mắt nhìn sang chỗ khác", "medium"
-        
-        # Cử động đầu bất thường (Head Pose)
-        if "head orientation" in flag_lower:
-            if "looking up" in flag_lower:
-                return "Đầu ngẩng lên", "medium"
-            if "looking down" in flag_lower:
-                return "Đầu cúi xuống", "medium"
-            if "looking left" in flag_lower:
-                return "Đầu quay trái", "medium"
-            if "looking right" in flag_lower:
-                return "Đầu quay phải", "medium"
-            return "Cử động đầu bất thường", "medium"
+    # KHÔNG NGHIÊM TRỌNG: Kiểm tra vi phạm về hướng nhìn/cử động đầu.
+    # Dùng trực tiếp hướng đầu/mắt mà pipeline gán cho khuôn mặt (cùng thứ tự
+    # với flags: hướng đầu được thêm trước hướng nhìn).
+    face = faces[0]
+    
+    # Cử động đầu bất thường (Head Pose)
+    orientation = face.get("orientation")
+    if orientation and orientation != "Straight":
+        return _HEAD_VIOLATIONS.get(orientation, "Cử động đầu bất thường"), "medium"
+    
+    # Nhìn chỗ khác (Gaze)
+    gaze = face.get("gaze")
+    if gaze and gaze != "Center":
+        return _GAZE_VIOLATIONS.get(gaze, "Mắt nhìn sang chỗ khác"), "medium"
     
     # Mặc định: Vi phạm khác
     return "Vi phạm khác", "medium"
@@ -596,28 +718,21 @@ def _calculate_confidence(result: Dict[str, Any]) -> float:
     Returns:
         Average confidence score (0.0-1.0)
     """
-    confidences = []
-    
-    # Face recognition confidence
-    for face in result.get("faces", []):
-        conf = face.get("confidence")
-        if conf is not None:
-            confidences.append(float(conf))
-    
-    # Object detection confidence
-    for obj in result.get("objects", []):
-        conf = obj.get("confidence")
-        if conf is not None:
-            confidences.append(float(conf))
+    confidences = [
+        float(conf)
+        for source in (result.get("faces", []), result.get("objects", []))
+        for conf in (item.get("confidence") for item in source)
+        if conf is not None
+    ]
     
     if confidences:
-        return round(sum(confidences) / len(confidences), 2)
+        return round(fmean(confidences), 2)
     return 0.0
 
 
 def _extract_name() -> str:
     if request.is_json:
-        payload = request.get_json() or {}
+        payload = _payload()
         name = payload.get("name")
         if name:
             return name.strip()
@@ -631,7 +746,7 @@ def _extract_name() -> str:
 def _extract_student_id() -> str:
     """Extract and validate student ID from request."""
     if request.is_json:
-        payload = request.get_json() or {}
+        payload = _payload()
         student_id = payload.get("student_id")
         if student_id:
             return student_id.strip()
@@ -646,7 +761,7 @@ def _extract_email() -> str:
     """Extract and validate email from request (optional)."""
     email = None
     if request.is_json:
-        payload = request.get_json() or {}
+        payload = _payload()
         email = payload.get("email")
     elif request.form:
         email = request.form.get("email")
@@ -654,14 +769,19 @@ def _extract_email() -> str:
     if email:
         email = email.strip()
         # Basic email validation
-        email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        if not re.match(email_pattern, email):
+        if not _EMAIL_RE.match(email):
             raise ValueError(f"Invalid email format: {email}")
     
     return email or ""
 
 
-def _extract_images():
+def _extract_images(max_dimension: int | None = None):
+    """
+    Decode all uploaded images (multipart or base64 JSON).
+
+    Args:
+        max_dimension: If set, downscale images whose longest side exceeds it
+    """
     images = []
     if request.files:
         file_list = request.files.getlist("images") or request.files.getlist("file")
@@ -669,11 +789,11 @@ def _extract_images():
             if not item or not item.filename:
                 continue
             try:
-                images.append(decode_image_from_bytes(item.read()))
+                images.append(decode_image_from_stream(item.stream))
             except ValueError as exc:
                 LOGGER.warning("Failed to decode uploaded image %d (%s): %s", idx, item.filename, exc)
     elif request.is_json:
-        payload: Dict[str, Any] = request.get_json() or {}
+        payload = _payload()
         base64_images = payload.get("images")
         single = payload.get("image_base64") or payload.get("image_bytes")
         if single and not base64_images:
@@ -684,22 +804,51 @@ def _extract_images():
                     images.append(decode_image_from_base64(data))
                 except ValueError as exc:
                     LOGGER.warning("Failed to decode base64 image %d: %s", idx, exc)
+    if max_dimension is not None:
+        images = [resize_to_max_dimension(image, max_dimension) for image in images]
     return images
 
 
-def _persist_annotated_image(image) -> str:
+def _clear_failed_upload(upload: Future, image_key: str) -> None:
     """
-    Store the annotated frame on disk and return the relative filename.
+    Done-callback of a violation image upload: if it failed, drop the URL
+    reserved for it from MySQL so no violation points at a missing object.
     """
-    success, buffer = cv2.imencode(".jpg", image)
-    if not success:
-        raise ValueError("Failed to encode annotated frame")
-    filename = f"{uuid.uuid4().hex}.jpg"
-    output_path = ANNOTATED_DIR / filename
-    output_path.write_bytes(buffer.tobytes())
+    try:
+        _, uploaded_key = upload.result()
+    except Exception:  # pragma: no cover - upload_violation_image catches its own
+        uploaded_key = None
+    if uploaded_key is None:
+        LOGGER.warning("Violation image upload failed, clearing %s", image_key)
+        mysql_service.clear_violation_image(image_key)
+
+
+def _persist_annotated_image(annotated_image) -> str:
+    """
+    Schedule storage of the annotated frame on disk.
+
+    The filename is generated up front so the URL can be returned
+    immediately; encoding and the write happen on EXECUTOR.
+    """
+    filename = secrets.token_hex(16) + ".jpg"
+    EXECUTOR.submit(_write_annotated_image, annotated_image, ANNOTATED_DIR / filename)
     return filename
 
 
+def _write_annotated_image(annotated_image, output_path: Path) -> None:
+    # Runs on EXECUTOR and nobody waits on its future: log failures here
+    try:
+        success, buffer = cv2.imencode(".jpg", annotated_image, JPEG_ENCODE_PARAMS)
+        if not success:
+            LOGGER.warning("Failed to persist annotated image: encoding failed")
+            return
+        buffer.tofile(str(output_path))
+    except Exception:
+        LOGGER.exception("Failed to persist annotated image %s", output_path.name)
+
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
+    get_pipeline()
+    # Development server; in production run: gunicorn -c gunicorn.conf.py app:app
     app.run(host="0.0.0.0", port=8001, debug=False)
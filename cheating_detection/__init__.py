@@ -1,18 +1,28 @@
 """
 High-level package exports for the cheating detection system.
+
+Exports are imported on first access, so light submodules such as
+`cheating_detection.face_database` can be used without loading the model
+stack (insightface, mediapipe, ultralytics).
 """
 
-from .face_database import FaceDatabase
-from .face_recognition import FaceRecognizer
-from .gaze import EyeGazeEstimator
-from .pipeline import CheatingDetectionPipeline, load_default_pipeline
-from .visualization import annotate_detections
+from importlib import import_module
+
+_EXPORTS = {
+    "CheatingDetectionPipeline": ".pipeline",
+    "FaceDatabase": ".face_database",
+    "FaceRecognizer": ".face_recognition",
+    "EyeGazeEstimator": ".gaze",
+    "annotate_detections": ".visualization",
+    "load_default_pipeline": ".pipeline",
+}
+
+__all__ = list(_EXPORTS)
+
 
-__all__ = [
-    "CheatingDetectionPipeline",
-    "FaceDatabase",
-    "FaceRecognizer",
-    "EyeGazeEstimator",
-    "annotate_detections",
-    "load_default_pipeline",
-]
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -1,74 +1,372 @@
 """
-Persistent storage for face embeddings using simple mean encoding.
+Persistent storage for face embeddings as a few prototypes per person.
 """
 
 from __future__ import annotations
 
+import contextlib
+import json
 import logging
+import os
 import pickle
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Tuple
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import numpy as np
 
+try:
+    import faiss
+except ImportError:  # pragma: no cover - optional, identify falls back to numpy
+    faiss = None
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: no cross-process locking
+    fcntl = None
+
 LOGGER = logging.getLogger(__name__)
 
+# Version 2 stores L2-normalized embeddings (older pickles are normalized on
+# load); version 3 moves them from pickle to a .npy matrix plus JSON sidecar;
+# version 4 preallocates matrix rows, with the used count kept in the sidecar;
+# version 5 stores the matrix as float16 (older float32 files are converted);
+# version 6 keeps several prototype rows per person, so sidecar names label rows
+FORMAT_VERSION = 6
+
+# Enrollment embeddings kept per person; a query matches its best prototype
+MAX_PROTOTYPES = 5
+
+# Unit-length embeddings lose no matching accuracy in half precision, which
+# halves the file and page cache footprint. Scoring still runs in float32.
+STORAGE_DTYPE = np.float16
+
+# Rows preallocated in a new matrix file; capacity doubles when it fills up
+INITIAL_CAPACITY = 64
+
+# Above this many identities the FAISS index switches from exact flat search
+# to IVF, which is faster but may occasionally miss the true best match
+IVF_MIN_IDENTITIES = 5000
+
 
 class FaceDatabase:
     """
-    Manage a dictionary mapping person labels to mean face embeddings.
+    Manage person labels with up to MAX_PROTOTYPES face embeddings each.
     Also stores metadata for each student (student_id, email, registration_date).
+
+    Embeddings live in a memory-mapped [capacity, D] float16 `.npy` matrix
+    next to `database_path`, with the owner name of each row, the used row
+    count and metadata in a `.json` sidecar. Adding a person writes its rows
+    in place and deleting one moves the last rows into the gaps; only the
+    sidecar is rewritten per mutation, and `flush()` syncs the matrix to disk.
+
+    Several processes may share the files: mutations hold an exclusive
+    `flock` on a `.lock` file and first reload whatever another process
+    wrote, and lookups reload when the sidecar changed on disk. A legacy
+    pickle at `database_path` is migrated on load.
     """
 
     def __init__(self, database_path: Path) -> None:
         self.path = Path(database_path)
-        self._embeddings: Dict[str, np.ndarray] = {}
+        self.matrix_path = self.path.with_suffix(".npy")
+        self.sidecar_path = self.path.with_suffix(".json")
+        self.lock_path = self.path.with_suffix(".lock")
+        # (inode, mtime, size) of the sidecar the in-memory state was read from
+        # or written to; a different stamp on disk means another process wrote it
+        self._sidecar_stamp: Optional[Tuple[int, int, int]] = None
         self._metadata: Dict[str, Dict[str, str]] = {}  # Store student metadata
+        self._by_student_id: Dict[str, str] = {}  # student_id -> name
+        # Backing memmap, the [R, D] view of its used rows, the owner name of
+        # each row and the rows owned by each name
+        self._storage: Optional[np.memmap] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._names: List[str] = []
+        self._rows: Dict[str, List[int]] = {}
+        # What identify scores against: a FAISS index over the matrix if faiss
+        # is installed, otherwise a float32 copy of it
+        self._search_index = None
+        # Bumped on every change to the stored embeddings, so callers can
+        # tell when results they cached from identify() are stale
+        self.revision = 0
         self._load()
 
     def _load(self) -> None:
-        if not self.path.exists():
+        legacy = self.path.exists()
+        if self.sidecar_path.exists() and not (
+            legacy and self.path.stat().st_mtime > self.sidecar_path.stat().st_mtime
+        ):
+            with self._file_lock(exclusive=False):
+                self._load_arrays()
+            if self._storage is not None and self._storage.dtype != STORAGE_DTYPE:
+                with self._exclusive():
+                    self._save()
+        elif legacy:
+            # Pickle written by an older release or by the training scripts:
+            # migrate it to the .npy layout once
+            with self._file_lock(exclusive=True):
+                self._write_all(self._load_pickle())
+        else:
             LOGGER.warning("Face database not found at %s. Starting empty.", self.path)
-            self._embeddings = {}
+            self._bind_storage(None, [])
             self._metadata = {}
+            self._by_student_id = {}
+            return
+        self._reindex_student_ids()
+        LOGGER.info("Loaded face database with %d identities", len(self._rows))
+
+    def _reindex_student_ids(self) -> None:
+        # The first registration wins for duplicate IDs, like the old linear scan
+        self._by_student_id = {}
+        for name, metadata in self._metadata.items():
+            self._by_student_id.setdefault(metadata.get("student_id"), name)
+
+    def _load_arrays(self) -> None:
+        # Stamp before reading: a write racing with the read just causes one
+        # more reload later
+        self._sidecar_stamp = self._sidecar_stat()
+        with self.sidecar_path.open("r", encoding="utf-8") as handle:
+            sidecar = json.load(handle)
+        names = [str(name) for name in sidecar["names"]]
+        self._metadata = sidecar.get("metadata", {})
+        if not names:
+            self._bind_storage(None, [])
+            return
+        # Memory-mapped: rows are paged in on first use rather than read up front
+        try:
+            storage = np.load(self.matrix_path, mmap_mode="r+")
+        except PermissionError:
+            LOGGER.warning("%s is read-only; the face database cannot be modified", self.matrix_path)
+            storage = np.load(self.matrix_path, mmap_mode="r")
+        if storage.shape[0] < len(names):
+            raise ValueError(
+                f"{self.matrix_path} has {storage.shape[0]} rows but "
+                f"{self.sidecar_path} lists {len(names)} names"
+            )
+        self._bind_storage(storage, names)
+
+    def _sidecar_stat(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.sidecar_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    @contextlib.contextmanager
+    def _file_lock(self, exclusive: bool) -> Iterator[None]:
+        """
+        Hold an exclusive or shared `flock` on the lock file. A separate file
+        is locked because the sidecar and matrix are swapped in with
+        os.replace, which would leave a lock on the old inode.
+        """
+        if fcntl is None:
+            yield
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            handle = self.lock_path.open("a")
+        except OSError:
+            # Read-only location: no process can write the files either
+            yield
+            return
+        with handle:
+            fcntl.flock(handle, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    @contextlib.contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        """
+        Lock out other writers, and bring the in-memory rows up to date with
+        the files first so a mutation never writes over rows another process
+        added or moved.
+        """
+        with self._file_lock(exclusive=True):
+            self._reload_if_changed()
+            yield
+
+    def _refresh(self) -> None:
+        """
+        Cheap check (one stat) before lookups; reload under a shared lock if
+        another process changed the database.
+        """
+        if self._sidecar_stat() != self._sidecar_stamp:
+            with self._file_lock(exclusive=False):
+                self._reload_if_changed()
+
+    def _reload_if_changed(self) -> None:
+        stamp = self._sidecar_stat()
+        if stamp is None or stamp == self._sidecar_stamp:
             return
+        LOGGER.info("Face database changed on disk, reloading %s", self.sidecar_path)
+        self._load_arrays()
+        self._reindex_student_ids()
+        self._search_index = None
+        self.revision += 1
+
+    def _load_pickle(self) -> Dict[str, np.ndarray]:
+        """
+        Read the legacy pickle, returning one [1, D] mean embedding per name.
+        """
         with self.path.open("rb") as handle:
             raw = pickle.load(handle)
         
         # Support both old format (dict of embeddings) and new format (dict with embeddings and metadata)
         if isinstance(raw, dict) and "embeddings" in raw:
             # New format
-            self._embeddings = {
+            embeddings = {
                 str(name): np.asarray(embedding, dtype=np.float32)
                 for name, embedding in raw["embeddings"].items()
             }
             self._metadata = raw.get("metadata", {})
+            version = raw.get("version", 1)
         else:
             # Old format - just embeddings
-            self._embeddings = {
+            embeddings = {
                 str(name): np.asarray(embedding, dtype=np.float32)
                 for name, embedding in raw.items()
             }
             self._metadata = {}
-        LOGGER.info("Loaded face database with %d identities", len(self._embeddings))
+            version = 1
+        if version < 2:
+            embeddings = {
+                name: _normalize(embedding) for name, embedding in embeddings.items()
+            }
+        return {name: np.atleast_2d(embedding) for name, embedding in embeddings.items()}
 
-    def save(self) -> None:
+    def _bind_storage(self, storage: Optional[np.memmap], names: List[str]) -> None:
+        """
+        Point the row lookups at the first len(names) rows of `storage`,
+        `names` giving the owner of each row.
+        """
+        self._storage = storage
+        self._names = names
+        self._rows = {}
+        for row, name in enumerate(names):
+            self._rows.setdefault(name, []).append(row)
+        self._matrix = storage[: len(names)] if names else None
+
+    def _write_storage(self, capacity: int, rows: np.ndarray) -> np.memmap:
+        """
+        Write `rows` into a new matrix file with room for `capacity` rows and
+        map it. The file is swapped in whole, so an older mapping that is
+        still in use is never truncated underneath its readers.
+        """
         self.path.parent.mkdir(parents=True, exist_ok=True)
-        data = {
-            "embeddings": self._embeddings,
-            "metadata": self._metadata
+        tmp_path = self.matrix_path.with_name(f"{self.matrix_path.name}.tmp")
+        storage = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=STORAGE_DTYPE, shape=(capacity, rows.shape[1])
+        )
+        storage[: len(rows)] = rows
+        storage.flush()
+        del storage
+        os.replace(tmp_path, self.matrix_path)
+        return np.load(self.matrix_path, mmap_mode="r+")
+
+    def _write_sidecar(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        sidecar = {
+            "version": FORMAT_VERSION,
+            "count": len(self._names),
+            "names": self._names,
+            "metadata": self._metadata,
         }
-        with self.path.open("wb") as handle:
-            pickle.dump(data, handle)
-        LOGGER.info("Persisted face database with %d identities", len(self._embeddings))
+        _replace_file(
+            self.sidecar_path,
+            lambda handle: handle.write(json.dumps(sidecar, ensure_ascii=False).encode("utf-8")),
+        )
+        self._sidecar_stamp = self._sidecar_stat()
+
+    def _append(self, name: str, vectors: np.ndarray) -> None:
+        count = len(self._names)
+        needed = count + len(vectors)
+        if self._storage is None:
+            self._storage = self._write_storage(max(INITIAL_CAPACITY, needed), vectors)
+        elif vectors.shape[1] != self._storage.shape[1]:
+            raise ValueError(
+                f"Embedding has {vectors.shape[1]} dimensions, database uses "
+                f"{self._storage.shape[1]}"
+            )
+        else:
+            if needed > self._storage.shape[0]:
+                # Amortised O(1): copy into a file (at least) twice as large
+                capacity = 2 * self._storage.shape[0]
+                while capacity < needed:
+                    capacity *= 2
+                self._bind_storage(
+                    self._write_storage(capacity, self._storage[:count]), self._names
+                )
+            self._storage[count:needed] = vectors
+        self._names.extend([name] * len(vectors))
+        self._rows[name] = list(range(count, needed))
+        self.revision += 1
+        self._matrix = self._storage[:needed]
+        if isinstance(self._search_index, np.ndarray):
+            self._search_index = None
+        elif self._search_index is not None:
+            self._search_index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+
+    def _remove(self, name: str) -> None:
+        # Highest rows first, so a row moved into a gap is never one that is
+        # still waiting to be removed
+        for row in sorted(self._rows.pop(name), reverse=True):
+            last = len(self._names) - 1
+            if row != last:
+                # Keep the used rows contiguous by moving the last one into the gap
+                moved = self._names[last]
+                self._storage[row] = self._storage[last]
+                self._names[row] = moved
+                owned = self._rows[moved]
+                owned[owned.index(last)] = row
+            self._names.pop()
+        self._matrix = self._storage[: len(self._names)] if self._names else None
+        self._search_index = None
+        self.revision += 1
+
+    def _write_all(self, prototypes: Dict[str, np.ndarray]) -> None:
+        """
+        Replace both files with `prototypes` ([K, D] rows per name).
+        """
+        names = [name for name, vectors in prototypes.items() for _ in range(len(vectors))]
+        if names:
+            rows = np.concatenate(list(prototypes.values())).astype(np.float32)
+            storage = self._write_storage(max(INITIAL_CAPACITY, len(names)), rows)
+        else:
+            storage = None
+        self._bind_storage(storage, names)
+        self._search_index = None
+        self.revision += 1
+        self._write_sidecar()
+        LOGGER.info("Persisted face database with %d identities", len(self._rows))
+
+    def save(self) -> None:
+        """
+        Rewrite both files from scratch, compacting the matrix.
+        """
+        with self._exclusive():
+            self._save()
+
+    def _save(self) -> None:
+        self._write_all({name: self._storage[rows] for name, rows in self._rows.items()})
+
+    def flush(self) -> None:
+        """
+        Sync the matrix to disk and rewrite the sidecar.
+        """
+        with self._exclusive():
+            if self._storage is not None:
+                self._storage.flush()
+            self._write_sidecar()
 
     @property
     def people(self) -> Tuple[str, ...]:
-        return tuple(sorted(self._embeddings.keys()))
+        self._refresh()
+        return tuple(sorted(self._rows.keys()))
 
     def has_person(self, name: str) -> bool:
-        return name in self._embeddings
+        self._refresh()
+        return name in self._rows
 
     def add_person(
         self, 
@@ -78,7 +376,8 @@ class FaceDatabase:
         email: Optional[str] = None,
     ) -> int:
         """
-        Add a new person using the mean embedding of the provided vectors.
+        Add a new person, keeping up to MAX_PROTOTYPES of the provided
+        vectors (chosen to be mutually dissimilar) as prototypes.
 
         Args:
             name: Student's full name
@@ -96,38 +395,83 @@ class FaceDatabase:
         ]
         if not vectors:
             raise ValueError("No embeddings supplied for new identity")
-        mean_embedding = np.mean(vectors, axis=0)
-        self._embeddings[name] = mean_embedding
-        
-        # Store metadata
-        self._metadata[name] = {
-            "student_id": student_id or "",
-            "email": email or "",
-            "registration_date": datetime.now().isoformat(),
-        }
-        
-        self.save()
+        prototypes = _select_prototypes(_normalize_rows(np.stack(vectors)), MAX_PROTOTYPES)
+        with self._exclusive():
+            if name in self._rows:
+                self._remove(name)
+            self._append(name, prototypes)
+            
+            # Store metadata
+            replaced = name in self._metadata
+            self._metadata[name] = {
+                "student_id": student_id or "",
+                "email": email or "",
+                "registration_date": datetime.now().isoformat(),
+            }
+            if replaced:
+                self._reindex_student_ids()
+            else:
+                self._by_student_id.setdefault(student_id or "", name)
+            
+            self._write_sidecar()
         return len(vectors)
 
     def identify(self, embedding: np.ndarray) -> Tuple[str, float]:
         """
-        Identify the closest person based on cosine similarity.
+        Identify the closest person based on cosine similarity to their best
+        matching prototype.
+
+        Stored embeddings are unit vectors, so only the query is normalized.
 
         Returns:
             A tuple of (name, score). Score is in [-1, 1]; higher is better.
             If the database is empty, returns ("Unknown", 0.0).
         """
-        if not self._embeddings:
-            return "Unknown", 0.0
-        query = _normalize(embedding)
-        best_score = -1.0
-        best_name = "Unknown"
-        for name, stored in self._embeddings.items():
-            score = float(np.dot(query, _normalize(stored)))
-            if score > best_score:
-                best_score = score
-                best_name = name
-        return best_name, best_score
+        return self.identify_batch(np.asarray(embedding, dtype=np.float32)[None, :])[0]
+
+    def identify_batch(self, embeddings: np.ndarray) -> List[Tuple[str, float]]:
+        """
+        Identify every row of a [K, D] embedding array with a single
+        [K, D] x [D, R] product over all prototype rows (or one FAISS search).
+        The best row is also the best per-person maximum, so its owner is the
+        match.
+
+        Returns:
+            One (name, score) tuple per row, as with `identify`.
+        """
+        queries = np.asarray(embeddings, dtype=np.float32)
+        self._refresh()
+        if not self._names:
+            return [("Unknown", 0.0)] * len(queries)
+        index, names = self._index()
+        if index is None:
+            return [("Unknown", 0.0)] * len(queries)
+        queries = _normalize_rows(queries)
+        if not isinstance(index, np.ndarray):
+            scores, rows = index.search(queries, 1)
+            return [
+                (names[int(row)], float(score)) if row >= 0 else ("Unknown", 0.0)
+                for row, score in zip(rows[:, 0], scores[:, 0])
+            ]
+        scores = queries @ index.T
+        best = scores.argmax(axis=1)
+        return [
+            (names[int(row)], float(scores[i, row])) for i, row in enumerate(best)
+        ]
+
+    def _index(self) -> Tuple[Any, List[str]]:
+        """
+        Return the search index and the row owners, building the index again
+        if a mutation invalidated it.
+        """
+        if self._search_index is None:
+            # The index copies the mapped rows; hold off writers meanwhile so
+            # the copy matches the names read with it
+            with self._file_lock(exclusive=False):
+                self._reload_if_changed()
+                if self._names:
+                    self._search_index = _build_search_index(self._matrix, len(self._rows))
+        return self._search_index, self._names
 
     def get_student_info(self, name: str) -> Optional[Dict[str, str]]:
         """
@@ -139,6 +483,7 @@ class FaceDatabase:
         Returns:
             Dictionary with student_id, email, registration_date or None if not found
         """
+        self._refresh()
         return self._metadata.get(name)
 
     def get_all_students(self) -> List[Dict[str, str]]:
@@ -148,8 +493,9 @@ class FaceDatabase:
         Returns:
             List of dictionaries containing name and metadata for each student
         """
+        self._refresh()
         students = []
-        for name in sorted(self._embeddings.keys()):
+        for name in sorted(self._rows.keys()):
             student_info = {
                 "name": name,
                 **self._metadata.get(name, {})
@@ -167,12 +513,14 @@ class FaceDatabase:
         Returns:
             True if person was removed, False if person didn't exist
         """
-        if name not in self._embeddings:
-            return False
-        del self._embeddings[name]
-        if name in self._metadata:
-            del self._metadata[name]
-        self.save()
+        with self._exclusive():
+            if name not in self._rows:
+                return False
+            self._remove(name)
+            if name in self._metadata:
+                del self._metadata[name]
+                self._reindex_student_ids()
+            self._write_sidecar()
         return True
 
     def find_by_student_id(self, student_id: str) -> Optional[str]:
@@ -185,14 +533,94 @@ class FaceDatabase:
         Returns:
             Student name if found, None otherwise
         """
-        for name, metadata in self._metadata.items():
-            if metadata.get("student_id") == student_id:
-                return name
-        return None
+        self._refresh()
+        return self._by_student_id.get(student_id)
+
+
+def count_identities(database_path: str | Path) -> int:
+    """
+    Count the people stored at `database_path` without opening it as a
+    FaceDatabase, which would migrate a legacy pickle and write files.
+    """
+    path = Path(database_path)
+    sidecar_path = path.with_suffix(".json")
+    # Same precedence as FaceDatabase._load: a pickle newer than the sidecar wins
+    if sidecar_path.exists() and not (
+        path.exists() and path.stat().st_mtime > sidecar_path.stat().st_mtime
+    ):
+        with sidecar_path.open("r", encoding="utf-8") as handle:
+            # Sidecar names label embedding rows, several per person
+            return len(set(json.load(handle)["names"]))
+    if path.exists():
+        with path.open("rb") as handle:
+            raw = pickle.load(handle)
+        return len(raw["embeddings"] if isinstance(raw, dict) and "embeddings" in raw else raw)
+    return 0
+
+
+def _build_search_index(matrix: np.ndarray, identities: int) -> Any:
+    """
+    Without faiss, upcast the float16 matrix once so scoring is a float32
+    BLAS product (numpy has no fast float16 matmul). With faiss, keep fp16
+    codes for exact cosine search (inner product over unit vectors), or IVF
+    with nlist ~ sqrt(rows) once there are more than IVF_MIN_IDENTITIES
+    people (each owning up to MAX_PROTOTYPES rows).
+    """
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    if faiss is None:
+        return matrix
+    count, dimension = matrix.shape
+    fp16 = faiss.ScalarQuantizer.QT_fp16
+    if identities <= IVF_MIN_IDENTITIES:
+        index = faiss.IndexScalarQuantizer(dimension, fp16, faiss.METRIC_INNER_PRODUCT)
+    else:
+        nlist = int(np.sqrt(count))
+        quantizer = faiss.IndexFlatIP(dimension)
+        index = faiss.IndexIVFScalarQuantizer(
+            quantizer, dimension, nlist, fp16, faiss.METRIC_INNER_PRODUCT
+        )
+        index.train(matrix)
+        index.nprobe = max(1, nlist // 8)
+    index.add(matrix)
+    return index
+
+
+def _select_prototypes(vectors: np.ndarray, count: int) -> np.ndarray:
+    """
+    Farthest-point sampling of up to `count` unit vectors, starting from the
+    one closest to the mean, so prototypes cover different poses and
+    lighting rather than near-duplicate shots.
+    """
+    if len(vectors) <= count:
+        return vectors
+    similarity = vectors @ vectors.T
+    chosen = [int((vectors @ vectors.mean(axis=0)).argmax())]
+    closest = similarity[chosen[0]].copy()
+    while len(chosen) < count:
+        pick = int(closest.argmin())
+        chosen.append(pick)
+        closest = np.maximum(closest, similarity[pick])
+    return vectors[chosen]
+
+
+def _replace_file(path: Path, write: Callable[[BinaryIO], object]) -> None:
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with tmp_path.open("wb") as handle:
+        write(handle)
+    os.replace(tmp_path, path)
 
 
 def _normalize(vector: np.ndarray) -> np.ndarray:
-    norm = np.linalg.norm(vector)
+    # A plain dot product avoids np.linalg.norm's dispatch overhead
+    norm = np.sqrt(np.dot(vector, vector))
     if norm == 0:
         return vector
     return vector / norm
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize every row of a [K, D] array; all-zero rows stay zero.
+    """
+    norms = np.sqrt(np.einsum("ij,ij->i", matrix, matrix))
+    return matrix / np.maximum(norms, 1e-12)[:, None]
@@ -1,12 +1,12 @@
 """
-Face recognition module backed by InsightFace and a mean-embedding database.
+Face recognition module backed by InsightFace and a prototype-embedding database.
 """
 
 from __future__ import annotations
 
 import logging
 from pathlib import Path
-from typing import Iterable, List, Optional, Sequence
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 import numpy as np
 
@@ -23,6 +23,17 @@ from .utils import bgr_to_rgb, ensure_uint8, serialize_bbox, to_float
 
 LOGGER = logging.getLogger(__name__)
 
+# Entries kept by FaceRecognizer's verify_student memo
+VERIFY_CACHE_SIZE = 1024
+
+
+def _default_ctx_id() -> int:
+    try:
+        import onnxruntime
+    except ImportError:  # pragma: no cover - installed with insightface
+        return -1
+    return 0 if "CUDAExecutionProvider" in onnxruntime.get_available_providers() else -1
+
 
 class FaceRecognizer:
     """
@@ -33,38 +44,66 @@ class FaceRecognizer:
         self,
         dataset_dir: Path,
         providers: Optional[Sequence[str]] = None,
-        ctx_id: int = -1,
+        ctx_id: Optional[int] = None,
         det_size: Iterable[int] = (640, 640),
         match_threshold: float = 0.5,
         database_filename: str = "face_database_kaggle.pkl",
+        min_face_size: float = 32.0,
+        min_det_score: float = 0.5,
     ) -> None:
         self.dataset_dir = Path(dataset_dir)
         if providers is None:
             providers = ["CUDAExecutionProvider", "CPUExecutionProvider"]
         self.providers = list(providers)
-        self.ctx_id = ctx_id
+        # Default to GPU 0 whenever ONNX Runtime was built with CUDA
+        self.ctx_id = _default_ctx_id() if ctx_id is None else ctx_id
         self.det_size = tuple(det_size)
         self.match_threshold = match_threshold
+        # Faces smaller than min_face_size x min_face_size px or detected with
+        # lower confidence are background noise and skipped in analyze()
+        self.min_face_area = min_face_size * min_face_size
+        self.min_det_score = min_det_score
         self.database = FaceDatabase(self.dataset_dir.parent / "models" / database_filename)
+        # (student_id, float16 embedding bytes) -> identify() result, for
+        # re-verification loops that submit the same frame again
+        self._verify_cache: Dict[Tuple[str, bytes], Tuple[str, float]] = {}
+        self._verify_cache_revision = self.database.revision
 
         self._face_app = FaceAnalysis(providers=self.providers)
         self._face_app.prepare(ctx_id=self.ctx_id, det_size=self.det_size)
 
-    def analyze(self, image_bgr: np.ndarray) -> List[dict]:
+    def _detect(self, image_bgr: np.ndarray, rgb: Optional[np.ndarray] = None) -> list:
+        """
+        Run InsightFace on a BGR image, reusing `rgb` if the caller already
+        converted it.
+        """
+        if rgb is None:
+            rgb = bgr_to_rgb(ensure_uint8(image_bgr))
+        return self._face_app.get(rgb)
+
+    def analyze(self, image_bgr: np.ndarray, rgb: Optional[np.ndarray] = None) -> List[dict]:
         """
         Run face detection + recognition on a BGR image.
+
+        `rgb` may carry an already converted copy of the frame.
         """
-        image = ensure_uint8(image_bgr)
-        rgb = bgr_to_rgb(image)
-        faces = self._face_app.get(rgb)
-        results = []
+        faces = self._detect(image_bgr, rgb)
+        embedded = []
         for face in faces:
-            embedding = getattr(face, "embedding", None)
-            if embedding is None:
+            if not self._is_usable(face):
+                LOGGER.debug("Tiny or low-confidence face skipped")
+                continue
+            if getattr(face, "embedding", None) is None:
                 LOGGER.debug("Face without embedding skipped")
                 continue
+            embedded.append(face)
+        if not embedded:
+            return []
 
-            raw_label, similarity = self.database.identify(embedding)
+        # Match all faces of the frame against the database in one product
+        matches = self.database.identify_batch(np.stack([face.embedding for face in embedded]))
+        results = []
+        for face, (raw_label, similarity) in zip(embedded, matches):
             if self.match_threshold is not None and similarity < self.match_threshold:
                 label = "Unknown"
             else:
@@ -82,6 +121,30 @@ class FaceRecognizer:
             results.append(result)
         return results
 
+    def _cached_identify(self, student_id: str, embedding: np.ndarray) -> Tuple[str, float]:
+        if self._verify_cache_revision != self.database.revision:
+            self._verify_cache.clear()
+            self._verify_cache_revision = self.database.revision
+        # float16 keys absorb tiny numerical noise between identical frames
+        key = (student_id, np.asarray(embedding, dtype=np.float16).tobytes())
+        match = self._verify_cache.get(key)
+        if match is None:
+            match = self.database.identify(embedding)
+            if len(self._verify_cache) >= VERIFY_CACHE_SIZE:
+                # FIFO eviction: dicts iterate in insertion order
+                del self._verify_cache[next(iter(self._verify_cache))]
+            self._verify_cache[key] = match
+        return match
+
+    def _is_usable(self, face) -> bool:
+        if getattr(face, "det_score", 1.0) < self.min_det_score:
+            return False
+        bbox = getattr(face, "bbox", None)
+        if bbox is None:
+            return True
+        x1, y1, x2, y2 = bbox[:4]
+        return (x2 - x1) * (y2 - y1) >= self.min_face_area
+
     def add_person(
         self,
         name: str,
@@ -112,9 +175,7 @@ class FaceRecognizer:
         face_hits = 0
         for raw_img in images_bgr:
             processed += 1
-            image = ensure_uint8(raw_img)
-            rgb = bgr_to_rgb(image)
-            faces = self._face_app.get(rgb)
+            faces = self._detect(raw_img)
             if not faces:
                 continue
             face_hits += 1
@@ -192,9 +253,7 @@ class FaceRecognizer:
             }
 
         # Detect face in provided image
-        image = ensure_uint8(image_bgr)
-        rgb = bgr_to_rgb(image)
-        faces = self._face_app.get(rgb)
+        faces = self._detect(image_bgr)
         
         if not faces:
             return {
@@ -232,7 +291,7 @@ class FaceRecognizer:
             }
 
         # Compare with registered student
-        matched_name, similarity = self.database.identify(embedding)
+        matched_name, similarity = self._cached_identify(student_id, embedding)
         
         # Verify if matched name is the expected student and similarity is above threshold
         verified = (matched_name == student_name) and (similarity >= threshold)
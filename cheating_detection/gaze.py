@@ -59,15 +59,18 @@ class EyeGazeEstimator:
         self,
         image_bgr: np.ndarray,
         bboxes: Sequence[Sequence[float]],
+        rgb: Optional[np.ndarray] = None,
     ) -> Dict[int, GazeEstimate]:
         """
         Estimate gaze for each face bounding box.
 
+        `rgb` may carry an already converted copy of the frame.
         Returns a mapping from index in `bboxes` to GazeEstimate.
         """
         if not bboxes:
             return {}
-        rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
+        if rgb is None:
+            rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
         results = self.face_mesh.process(rgb)
         height, width = image_bgr.shape[:2]
         mesh_landmarks = results.multi_face_landmarks or []
@@ -45,10 +45,26 @@ class SuspiciousObjectDetector:
         results = self.model.predict(
             image, verbose=False, conf=self.confidence_threshold
         )
-        detections: List[dict] = []
         if not results:
-            return detections
-        result = results[0]
+            return []
+        return self._parse_result(results[0])
+
+    def analyze_batch(self, images_bgr: Sequence[np.ndarray]) -> List[List[dict]]:
+        """
+        Run a single batched YOLO forward pass over several images.
+
+        Returns one detection list per input image, in order.
+        """
+        if not images_bgr:
+            return []
+        images = [ensure_uint8(image) for image in images_bgr]
+        results = self.model.predict(
+            images, verbose=False, conf=self.confidence_threshold
+        )
+        return [self._parse_result(result) for result in results]
+
+    def _parse_result(self, result) -> List[dict]:
+        detections: List[dict] = []
         names = result.names or self.model.names
         boxes = getattr(result, "boxes", None)
         if boxes is None:
@@ -6,7 +6,7 @@ from __future__ import annotations
 
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence
 
 from .config import (
     DEFAULT_FACE_DATASET_DIR,
@@ -18,7 +18,7 @@ from .face_recognition import FaceRecognizer
 from .gaze import EyeGazeEstimator
 from .head_pose import HeadPoseClassifier, HeadPoseThresholds
 from .object_detection import SuspiciousObjectDetector
-from .utils import ensure_uint8
+from .utils import bgr_to_rgb, ensure_uint8
 from .visualization import annotate_detections
 import numpy as np
 
@@ -64,11 +64,37 @@ class CheatingDetectionPipeline:
         self.head_pose = HeadPoseClassifier(self.options.head_pose_thresholds)
         self.eye_gaze = EyeGazeEstimator()
 
+    def warmup(self, size: int = 640) -> None:
+        """
+        Run one inference on a blank frame so that lazy model setup (CUDA
+        context, cuDNN autotuning, ONNX Runtime sessions) happens before the
+        first real request instead of during it.
+        """
+        self.analyze(np.zeros((size, size, 3), dtype=np.uint8))
+
     def analyze(self, image_bgr: np.ndarray) -> Dict[str, Any]:
         image = ensure_uint8(image_bgr)
+        return self._analyze_with_objects(image, self.object_detector.analyze(image))
+
+    def analyze_batch(self, images_bgr: Sequence[np.ndarray]) -> List[Dict[str, Any]]:
+        """
+        Analyze several frames, running YOLO once for the whole batch.
+
+        Face recognition and gaze estimation still run per frame.
+        """
+        images = [ensure_uint8(image) for image in images_bgr]
+        batch_objects = self.object_detector.analyze_batch(images)
+        return [
+            self._analyze_with_objects(image, objects)
+            for image, objects in zip(images, batch_objects)
+        ]
 
-        faces = self.face_recognizer.analyze(image)
-        objects = self.object_detector.analyze(image)
+    def _analyze_with_objects(
+        self, image: np.ndarray, objects: List[dict]
+    ) -> Dict[str, Any]:
+        # Converted once and shared by InsightFace and MediaPipe
+        rgb = bgr_to_rgb(image)
+        faces = self.face_recognizer.analyze(image, rgb)
 
         flags: List[str] = []
         enriched_faces: List[Dict[str, Any]] = []
@@ -87,7 +113,7 @@ class CheatingDetectionPipeline:
         gaze_map = {}
         if bbox_indices:
             _, bbox_list = zip(*bbox_indices)
-            gaze_estimates = self.eye_gaze.estimate(image, bbox_list)
+            gaze_estimates = self.eye_gaze.estimate(image, bbox_list, rgb)
             for local_idx, estimate in gaze_estimates.items():
                 face_idx = bbox_indices[local_idx][0]
                 gaze_map[face_idx] = estimate
@@ -5,15 +5,16 @@ Utility helpers for image handling and result formatting.
 from __future__ import annotations
 
 import base64
-from typing import Any, Dict, Iterable, List
+import os
+from typing import IO, Any, Dict, Iterable, List, Union
 
 import cv2
 import numpy as np
 
 
-def decode_image_from_bytes(content: bytes) -> np.ndarray:
+def decode_image_from_bytes(content: Union[bytes, memoryview]) -> np.ndarray:
     """
-    Decode raw bytes into an OpenCV BGR image.
+    Decode raw bytes (or any buffer) into an OpenCV BGR image.
 
     Raises:
         ValueError: When the bytes cannot be decoded into an image.
@@ -25,6 +26,29 @@ def decode_image_from_bytes(content: bytes) -> np.ndarray:
     return image
 
 
+def decode_image_from_stream(stream: IO[bytes]) -> np.ndarray:
+    """
+    Decode an uploaded file stream into an OpenCV BGR image without first
+    copying it into a bytes object.
+
+    Werkzeug spools uploads to a SpooledTemporaryFile: while it is still in
+    memory, its BytesIO buffer is decoded in place; once rolled over to disk,
+    the file is read straight into a preallocated uint8 array.
+    """
+    # SpooledTemporaryFile keeps the BytesIO (or the rolled-over file) in _file
+    getbuffer = getattr(getattr(stream, "_file", stream), "getbuffer", None)
+    if getbuffer is not None:
+        return decode_image_from_bytes(getbuffer())
+    if not (hasattr(stream, "readinto") and stream.seekable()):
+        return decode_image_from_bytes(stream.read())
+    start = stream.tell()
+    size = stream.seek(0, os.SEEK_END) - start
+    stream.seek(start)
+    content = np.empty(size, dtype=np.uint8)
+    read = stream.readinto(content)
+    return decode_image_from_bytes(content[:read])
+
+
 def decode_image_from_base64(data: str) -> np.ndarray:
     """
     Decode a base64-encoded string into an OpenCV BGR image.
@@ -46,13 +70,31 @@ def bgr_to_rgb(image: np.ndarray) -> np.ndarray:
 def ensure_uint8(image: np.ndarray) -> np.ndarray:
     """
     Coerce an image to uint8 for downstream model consumption.
+
+    Contiguous uint8 input, the common case, is returned without copying.
     """
     if image.dtype == np.uint8:
-        return image
+        if image.flags["C_CONTIGUOUS"]:
+            return image
+        return np.ascontiguousarray(image)
     clipped = np.clip(image, 0, 255)
     return clipped.astype(np.uint8)
 
 
+def resize_to_max_dimension(image: np.ndarray, max_dimension: int) -> np.ndarray:
+    """
+    Downscale an image so its longest side is at most `max_dimension`,
+    preserving aspect ratio. Smaller images are returned unchanged.
+    """
+    height, width = image.shape[:2]
+    longest = max(height, width)
+    if longest <= max_dimension:
+        return image
+    scale = max_dimension / longest
+    new_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(image, new_size, interpolation=cv2.INTER_AREA)
+
+
 def serialize_bbox(bbox: Iterable[float]) -> List[float]:
     """
     Convert a bounding box iterable to a plain list of floats.
@@ -4,6 +4,6 @@ Database package for violation tracking.
 
 from .config import mysql_config, s3_config
 from .mysql_service import mysql_service
-from .s3_service import s3_service
+from .s3_service import get_s3_service
 
-__all__ = ['mysql_service', 's3_service', 'mysql_config', 's3_config']
+__all__ = ['mysql_service', 'get_s3_service', 'mysql_config', 's3_config']
@@ -20,6 +20,10 @@ class S3Config:
     endpoint_url: str = os.getenv("AWS_ENDPOINT_URL")  # For Cloudflare R2 or custom S3
     public_url: str = os.getenv("AWS_PUBLIC_URL")      # Public URL base for files
     base_path: str = "violations"  # Base path in S3 bucket
+    # Longest side of uploaded violation images, larger frames are downscaled (0 = keep)
+    max_upload_dim: int = int(os.getenv("S3_MAX_UPLOAD_DIM", "1280"))
+    # JPEG quality of uploaded violation images (1-100)
+    jpeg_quality: int = int(os.getenv("S3_JPEG_QUALITY", "85"))
 
 
 @dataclass
@@ -32,6 +36,10 @@ class MySQLConfig:
     password: str = os.getenv("MYSQL_PASSWORD", "")
     charset: str = "utf8mb4"
     autocommit: bool = True
+    # Connection pool sizing (gunicorn threads per worker share one pool)
+    pool_min_cached: int = int(os.getenv("MYSQL_POOL_MIN_CACHED", "2"))
+    pool_max_cached: int = int(os.getenv("MYSQL_POOL_MAX_CACHED", "10"))
+    pool_max_connections: int = int(os.getenv("MYSQL_POOL_MAX_CONNECTIONS", "32"))
 
 
 # Singleton instances
@@ -2,13 +2,15 @@
 MySQL database service for violation tracking.
 """
 
-import json
 import logging
+import threading
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
 
+import orjson
 import pymysql
-from pymysql.cursors import DictCursor
+from dbutils.pooled_db import PooledDB
+from pymysql.cursors import DictCursor, SSDictCursor
 
 from .config import mysql_config
 
@@ -20,27 +22,64 @@ class MySQLService:
 
     def __init__(self):
         self.config = mysql_config
-        self._connection = None
+        # Created on first use so importing the service never opens sockets
+        self._pool: Optional[PooledDB] = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self) -> PooledDB:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    try:
+                        self._pool = PooledDB(
+                            creator=pymysql,
+                            mincached=self.config.pool_min_cached,
+                            maxcached=self.config.pool_max_cached,
+                            maxconnections=self.config.pool_max_connections,
+                            blocking=True,
+                            ping=1,  # Reconnect pooled connections that timed out
+                            host=self.config.host,
+                            port=self.config.port,
+                            user=self.config.user,
+                            password=self.config.password,
+                            database=self.config.database,
+                            charset=self.config.charset,
+                            cursorclass=DictCursor,
+                            autocommit=self.config.autocommit
+                        )
+                        LOGGER.info("MySQL connection pool established")
+                    except pymysql.Error as e:
+                        LOGGER.error(f"Failed to connect to MySQL: {e}")
+                        raise
+        return self._pool
 
     def _get_connection(self):
-        """Get or create MySQL connection."""
-        if self._connection is None or not self._connection.open:
-            try:
-                self._connection = pymysql.connect(
-                    host=self.config.host,
-                    port=self.config.port,
-                    user=self.config.user,
-                    password=self.config.password,
-                    database=self.config.database,
-                    charset=self.config.charset,
-                    cursorclass=DictCursor,
-                    autocommit=self.config.autocommit
-                )
-                LOGGER.info("MySQL connection established")
-            except pymysql.Error as e:
-                LOGGER.error(f"Failed to connect to MySQL: {e}")
-                raise
-        return self._connection
+        """
+        Borrow a connection from the pool. Use it as a context manager so it
+        is returned to the pool afterwards.
+        """
+        return self._get_pool().connection()
+
+    def get_user_id_by_student_code(self, student_code: str) -> Optional[int]:
+        """
+        Look up the users.id of a student by code (users.employee_code).
+
+        Args:
+            student_code: Student ID (mã học sinh)
+
+        Returns:
+            User ID or None if no user has this code
+
+        Raises:
+            pymysql.Error: If the query fails
+        """
+        with self._get_connection() as conn, conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT id FROM users WHERE employee_code = %s LIMIT 1",
+                (student_code,)
+            )
+            row = cursor.fetchone()
+        return row['id'] if row else None
 
     def insert_violation(
         self,
@@ -74,8 +113,7 @@ class MySQLService:
             Inserted violation ID or None if failed
         """
         try:
-            conn = self._get_connection()
-            with conn.cursor() as cursor:
+            with self._get_connection() as conn, conn.cursor() as cursor:
                 sql = """
                 INSERT INTO violations (
                     exam_period_id, submission_id, user_id, violation_type,
@@ -92,7 +130,7 @@ class MySQLService:
                     confidence,
                     image_url,
                     image_key,
-                    json.dumps(detection_data),
+                    orjson.dumps(detection_data, option=orjson.OPT_SERIALIZE_NUMPY).decode(),
                     detected_at
                 ))
                 violation_id = cursor.lastrowid
@@ -123,44 +161,30 @@ class MySQLService:
         Returns:
             True if successful, False otherwise
         """
+        critical, high, medium, low = _severity_counts(severity)
         try:
-            conn = self._get_connection()
-            with conn.cursor() as cursor:
-                # Use INSERT ... ON DUPLICATE KEY UPDATE
+            with self._get_connection() as conn, conn.cursor() as cursor:
+                # Use INSERT ... ON DUPLICATE KEY UPDATE; risk_score is a
+                # generated column computed by MySQL from the counters
                 sql = """
                 INSERT INTO violation_summary (
                     submission_id, user_id, exam_period_id,
                     total_violations, critical_count, high_count,
                     medium_count, low_count, first_violation_at,
-                    last_violation_at, risk_score
-                ) VALUES (%s, %s, %s, 1,
-                    CASE WHEN %s = 'critical' THEN 1 ELSE 0 END,
-                    CASE WHEN %s = 'high' THEN 1 ELSE 0 END,
-                    CASE WHEN %s = 'medium' THEN 1 ELSE 0 END,
-                    CASE WHEN %s = 'low' THEN 1 ELSE 0 END,
-                    %s, %s, 0
-                )
+                    last_violation_at
+                ) VALUES (%s, %s, %s, 1, %s, %s, %s, %s, %s, %s)
                 ON DUPLICATE KEY UPDATE
                     total_violations = total_violations + 1,
-                    critical_count = critical_count + CASE WHEN %s = 'critical' THEN 1 ELSE 0 END,
-                    high_count = high_count + CASE WHEN %s = 'high' THEN 1 ELSE 0 END,
-                    medium_count = medium_count + CASE WHEN %s = 'medium' THEN 1 ELSE 0 END,
-                    low_count = low_count + CASE WHEN %s = 'low' THEN 1 ELSE 0 END,
-                    last_violation_at = %s,
-                    risk_score = (
-                        (critical_count + CASE WHEN %s = 'critical' THEN 1 ELSE 0 END) * 50 +
-                        (high_count + CASE WHEN %s = 'high' THEN 1 ELSE 0 END) * 10 +
-                        (medium_count + CASE WHEN %s = 'medium' THEN 1 ELSE 0 END) * 10 +
-                        (low_count + CASE WHEN %s = 'low' THEN 1 ELSE 0 END) * 10
-                    )
+                    critical_count = critical_count + VALUES(critical_count),
+                    high_count = high_count + VALUES(high_count),
+                    medium_count = medium_count + VALUES(medium_count),
+                    low_count = low_count + VALUES(low_count),
+                    last_violation_at = VALUES(last_violation_at)
                 """
                 cursor.execute(sql, (
                     submission_id, user_id, exam_period_id,
-                    severity, severity, severity, severity,
-                    detected_at, detected_at,
-                    severity, severity, severity, severity,
-                    detected_at,
-                    severity, severity, severity, severity
+                    critical, high, medium, low,
+                    detected_at, detected_at
                 ))
                 LOGGER.info(f"Updated violation summary for submission {submission_id}")
                 return True
@@ -168,6 +192,114 @@ class MySQLService:
             LOGGER.error(f"Failed to update violation summary: {e}")
             return False
 
+    def insert_violations_bulk(self, rows: Sequence[Tuple]) -> List[Optional[int]]:
+        """
+        Insert several violations and update their summaries in one
+        transaction.
+
+        Args:
+            rows: Tuples in `violations` column order: (exam_period_id,
+                submission_id, user_id, violation_type, severity, confidence,
+                image_url, image_key, detection_data, detected_at), with
+                detection_data already serialized to JSON
+
+        Returns:
+            Inserted violation IDs in row order, or all None if failed
+        """
+        if not rows:
+            return []
+        summaries: Dict[int, Dict[str, Any]] = {}
+        for exam_period_id, submission_id, user_id, _, severity, *_, detected_at in rows:
+            summary = summaries.setdefault(submission_id, {
+                "user_id": user_id,
+                "exam_period_id": exam_period_id,
+                "critical": 0, "high": 0, "medium": 0, "low": 0,
+                "first": detected_at,
+                "last": detected_at,
+            })
+            if severity in summary:
+                summary[severity] += 1
+            summary["first"] = min(summary["first"], detected_at)
+            summary["last"] = max(summary["last"], detected_at)
+        summary_rows = [
+            (
+                submission_id, s["user_id"], s["exam_period_id"],
+                s["critical"] + s["high"] + s["medium"] + s["low"],
+                s["critical"], s["high"], s["medium"], s["low"],
+                s["first"], s["last"],
+            )
+            for submission_id, s in summaries.items()
+        ]
+        try:
+            with self._get_connection() as conn:
+                conn.begin()
+                try:
+                    with conn.cursor() as cursor:
+                        # One multi-row INSERT (executemany may split it into
+                        # several statements): InnoDB gives a simple insert
+                        # consecutive IDs starting at lastrowid, spaced by
+                        # auto_increment_increment
+                        placeholders = ", ".join(
+                            ["(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"] * len(rows)
+                        )
+                        cursor.execute(f"""
+                        INSERT INTO violations (
+                            exam_period_id, submission_id, user_id, violation_type,
+                            severity, confidence, image_url, image_key,
+                            detection_data, detected_at
+                        ) VALUES {placeholders}
+                        """, [value for row in rows for value in row])
+                        first_id = cursor.lastrowid
+                        cursor.execute("SELECT @@auto_increment_increment AS step")
+                        step = cursor.fetchone()['step']
+                        cursor.executemany("""
+                        INSERT INTO violation_summary (
+                            submission_id, user_id, exam_period_id,
+                            total_violations, critical_count, high_count,
+                            medium_count, low_count, first_violation_at,
+                            last_violation_at
+                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                        ON DUPLICATE KEY UPDATE
+                            total_violations = total_violations + VALUES(total_violations),
+                            critical_count = critical_count + VALUES(critical_count),
+                            high_count = high_count + VALUES(high_count),
+                            medium_count = medium_count + VALUES(medium_count),
+                            low_count = low_count + VALUES(low_count),
+                            last_violation_at = GREATEST(last_violation_at, VALUES(last_violation_at))
+                        """, summary_rows)
+                    conn.commit()
+                except BaseException:
+                    conn.rollback()
+                    raise
+            LOGGER.info(f"Inserted {len(rows)} violations for {len(summaries)} submissions")
+            return [first_id + i * step for i in range(len(rows))]
+        except pymysql.Error as e:
+            LOGGER.error(f"Failed to insert violations: {e}")
+            return [None] * len(rows)
+
+    def clear_violation_image(self, image_key: str) -> bool:
+        """
+        Remove the image URL and key from violations whose image upload
+        failed after the key was reserved and stored.
+
+        Args:
+            image_key: S3 key reserved for the image
+
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            with self._get_connection() as conn, conn.cursor() as cursor:
+                sql = """
+                UPDATE violations SET image_url = NULL, image_key = NULL
+                WHERE image_key = %s
+                """
+                cursor.execute(sql, (image_key,))
+                return True
+        except pymysql.Error as e:
+            LOGGER.error(f"Failed to clear violation image {image_key}: {e}")
+            return False
+
     def get_violations_by_submission(
         self,
         submission_id: int,
@@ -184,27 +316,52 @@ class MySQLService:
             List of violation records
         """
         try:
-            conn = self._get_connection()
-            with conn.cursor() as cursor:
-                sql = """
-                SELECT * FROM violations
-                WHERE submission_id = %s
-                ORDER BY detected_at DESC
-                LIMIT %s
-                """
-                cursor.execute(sql, (submission_id, limit))
-                results = cursor.fetchall()
-                
-                # Parse JSON detection_data
-                for row in results:
-                    if row.get('detection_data'):
-                        row['detection_data'] = json.loads(row['detection_data'])
-                
-                return results
+            return list(self.iter_violations_by_submission(submission_id, limit))
         except pymysql.Error as e:
             LOGGER.error(f"Failed to get violations: {e}")
             return []
 
+    def iter_violations_by_submission(
+        self,
+        submission_id: int,
+        limit: Optional[int] = None,
+        parse_detection_data: bool = True
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the violations of a submission, newest first.
+
+        Rows are read with an unbuffered server-side cursor, so large exports
+        never hold the whole result set in memory. The pooled connection is
+        held until the iterator is exhausted or closed.
+
+        Args:
+            submission_id: Submission ID
+            limit: Maximum number of records to return (None for all)
+            parse_detection_data: Decode the detection_data JSON of each row;
+                pass False to get the raw JSON string and skip parsing
+
+        Yields:
+            Violation records
+
+        Raises:
+            pymysql.Error: If the query fails
+        """
+        sql = """
+        SELECT * FROM violations
+        WHERE submission_id = %s
+        ORDER BY detected_at DESC
+        """
+        params: Tuple = (submission_id,)
+        if limit is not None:
+            sql += " LIMIT %s"
+            params += (limit,)
+        with self._get_connection() as conn, conn.cursor(SSDictCursor) as cursor:
+            cursor.execute(sql, params)
+            for row in cursor:
+                if parse_detection_data and row.get('detection_data'):
+                    row['detection_data'] = orjson.loads(row['detection_data'])
+                yield row
+
     def get_violation_summary(self, submission_id: int) -> Optional[Dict[str, Any]]:
         """
         Get violation summary for a submission.
@@ -216,8 +373,7 @@ class MySQLService:
             Summary record or None
         """
         try:
-            conn = self._get_connection()
-            with conn.cursor() as cursor:
+            with self._get_connection() as conn, conn.cursor() as cursor:
                 sql = "SELECT * FROM violation_summary WHERE submission_id = %s"
                 cursor.execute(sql, (submission_id,))
                 return cursor.fetchone()
@@ -226,10 +382,21 @@ class MySQLService:
             return None
 
     def close(self):
-        """Close MySQL connection."""
-        if self._connection and self._connection.open:
-            self._connection.close()
-            LOGGER.info("MySQL connection closed")
+        """Close all pooled MySQL connections."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+            LOGGER.info("MySQL connection pool closed")
+
+
+def _severity_counts(severity: str) -> Tuple[int, int, int, int]:
+    """(critical, high, medium, low) increments for one violation."""
+    return (
+        int(severity == 'critical'),
+        int(severity == 'high'),
+        int(severity == 'medium'),
+        int(severity == 'low'),
+    )
 
 
 # Singleton instance
@@ -2,20 +2,35 @@
 S3 service for uploading violation images.
 """
 
+import atexit
+import functools
+import itertools
 import logging
-from datetime import datetime
-from io import BytesIO
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Optional, Tuple
 
 import boto3
 import cv2
 import numpy as np
+from botocore.config import Config
 from botocore.exceptions import BotoCoreError, ClientError
 
+from cheating_detection.utils import resize_to_max_dimension
+
+try:
+    from turbojpeg import TJSAMP_420, TurboJPEG
+except ImportError:  # pragma: no cover - optional, cv2 encodes instead
+    TurboJPEG = None
+
 from .config import s3_config
 
 LOGGER = logging.getLogger(__name__)
 
+# Object key layout of violation images
+_KEY_TMPL = "{base}/exam_{eid}/submission_{sid}/user_{uid}/{vt}_{ts}.jpg"
+
 
 class S3Service:
     """Handle S3 operations for violation images."""
@@ -24,13 +39,38 @@ class S3Service:
         self.bucket_name = s3_config.bucket_name
         self.base_path = s3_config.base_path
         self.public_url = s3_config.public_url
+        # Constant URL prefix, computed once instead of on every upload
+        if self.public_url:
+            # Use public URL for Cloudflare R2
+            self._url_prefix = f"{self.public_url.rstrip('/')}/"
+        else:
+            # Use default S3 URL
+            self._url_prefix = f"https://{self.bucket_name}.s3.{s3_config.region}.amazonaws.com/"
+        # Key suffix counter: unique within the process, the pid keeps keys
+        # from different gunicorn workers apart
+        self._key_counter = itertools.count()
+        self._pid = os.getpid()
+        # Uploads are I/O bound and share the (thread-safe) client
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="s3-upload")
+        atexit.register(self.shutdown)
+        self._turbojpeg = _load_turbojpeg()
+        # Evidence frames only need to stay legible: 4:2:0 chroma subsampling
+        # at s3_config.jpeg_quality, with optimized Huffman tables, baseline
+        self._jpeg_quality = s3_config.jpeg_quality
+        self._encode_params = [
+            int(cv2.IMWRITE_JPEG_QUALITY), self._jpeg_quality,
+            int(cv2.IMWRITE_JPEG_SAMPLING_FACTOR), int(cv2.IMWRITE_JPEG_SAMPLING_FACTOR_420),
+            int(cv2.IMWRITE_JPEG_OPTIMIZE), 1,
+            int(cv2.IMWRITE_JPEG_PROGRESSIVE), 0,
+        ]
         
         # Initialize S3 client with optional custom endpoint (Cloudflare R2)
         try:
             client_config = {
                 'region_name': s3_config.region,
                 'aws_access_key_id': s3_config.access_key,
-                'aws_secret_access_key': s3_config.secret_key
+                'aws_secret_access_key': s3_config.secret_key,
+                'config': _client_config()
             }
             
             # Add custom endpoint if provided (for Cloudflare R2)
@@ -44,13 +84,41 @@ class S3Service:
             LOGGER.error(f"Failed to initialize S3 client: {e}")
             self.s3_client = None
 
+    def build_violation_key(
+        self,
+        exam_period_id: int,
+        submission_id: int,
+        user_id: int,
+        violation_type: str
+    ) -> Tuple[str, str]:
+        """
+        Build the S3 URL and key for a violation image without uploading it.
+
+        Lets callers record the URL right away and upload in the background.
+
+        Returns:
+            Tuple of (s3_url, s3_key)
+        """
+        # Generate S3 key with hierarchical structure
+        # Zero-padded (pid_max < 10**7) so one process's keys sort in creation order
+        timestamp = f"{int(time.time())}_{self._pid:07d}_{next(self._key_counter):010d}"
+        s3_key = _key_for(
+            self.base_path, exam_period_id, submission_id, user_id, violation_type, timestamp
+        )
+        return self._url_for_key(s3_key), s3_key
+
+    def _url_for_key(self, s3_key: str) -> str:
+        """Generate the public URL of an object key."""
+        return f"{self._url_prefix}{s3_key}"
+
     def upload_violation_image(
         self,
         image_bgr: np.ndarray,
         exam_period_id: int,
         submission_id: int,
         user_id: int,
-        violation_type: str
+        violation_type: str,
+        s3_key: Optional[str] = None
     ) -> Tuple[Optional[str], Optional[str]]:
         """
         Upload violation image to S3.
@@ -61,6 +129,7 @@ class S3Service:
             submission_id: Submission ID
             user_id: Student user ID
             violation_type: Type of violation
+            s3_key: Key reserved earlier with build_violation_key (optional)
 
         Returns:
             Tuple of (s3_url, s3_key) or (None, None) if failed
@@ -70,48 +139,36 @@ class S3Service:
             return None, None
 
         try:
-            # Generate S3 key with hierarchical structure
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-            s3_key = (
-                f"{self.base_path}/"
-                f"exam_{exam_period_id}/"
-                f"submission_{submission_id}/"
-                f"user_{user_id}/"
-                f"{violation_type}_{timestamp}.jpg"
-            )
+            if s3_key is None:
+                s3_url, s3_key = self.build_violation_key(
+                    exam_period_id, submission_id, user_id, violation_type
+                )
+            else:
+                s3_url = self._url_for_key(s3_key)
 
             # Encode image to JPEG
-            success, buffer = cv2.imencode('.jpg', image_bgr, [cv2.IMWRITE_JPEG_QUALITY, 90])
-            if not success:
+            jpeg = self._encode_jpeg(image_bgr)
+            if jpeg is None:
                 LOGGER.error("Failed to encode image to JPEG")
                 return None, None
 
-            # Upload to S3
-            image_bytes = BytesIO(buffer.tobytes())
-            self.s3_client.upload_fileobj(
-                image_bytes,
-                self.bucket_name,
-                s3_key,
-                ExtraArgs={
-                    'ContentType': 'image/jpeg',
-                    # 'Metadata': {
-                    #     'exam_period_id': str(exam_period_id),
-                    #     'submission_id': str(submission_id),
-                    #     'user_id': str(user_id),
-                    #     'violation_type': violation_type,
-                    #     'uploaded_at': datetime.now().isoformat()
-                    # }
-                }
+            # Upload to S3: one PUT straight from the encoded bytes, with an
+            # explicit length so botocore does not buffer or probe the body
+            self.s3_client.put_object(
+                Bucket=self.bucket_name,
+                Key=s3_key,
+                Body=jpeg,
+                ContentLength=len(jpeg),
+                ContentType='image/jpeg',
+                # Metadata={
+                #     'exam_period_id': str(exam_period_id),
+                #     'submission_id': str(submission_id),
+                #     'user_id': str(user_id),
+                #     'violation_type': violation_type,
+                #     'uploaded_at': datetime.now().isoformat()
+                # }
             )
 
-            # Generate public URL
-            if self.public_url:
-                # Use public URL for Cloudflare R2
-                s3_url = f"{self.public_url}/{s3_key}"
-            else:
-                # Use default S3 URL
-                s3_url = f"https://{self.bucket_name}.s3.{s3_config.region}.amazonaws.com/{s3_key}"
-            
             LOGGER.info(f"Uploaded violation image: {s3_key}")
             return s3_url, s3_key
 
@@ -122,6 +179,51 @@ class S3Service:
             LOGGER.error(f"Unexpected error during S3 upload: {e}")
             return None, None
 
+    def _encode_jpeg(self, image_bgr: np.ndarray) -> Optional[bytes]:
+        """
+        Encode a BGR frame, with libjpeg-turbo's SIMD encoder if available.
+
+        Frames larger than `s3_config.max_upload_dim` are downscaled first;
+        evidence only needs to stay legible.
+        """
+        if s3_config.max_upload_dim > 0:
+            image_bgr = resize_to_max_dimension(image_bgr, s3_config.max_upload_dim)
+        if self._turbojpeg is not None:
+            return self._turbojpeg.encode(
+                image_bgr, quality=self._jpeg_quality, jpeg_subsample=TJSAMP_420
+            )
+        success, buffer = cv2.imencode('.jpg', image_bgr, self._encode_params)
+        return buffer.tobytes() if success else None
+
+    def upload_violation_image_async(
+        self,
+        image_bgr: np.ndarray,
+        exam_period_id: int,
+        submission_id: int,
+        user_id: int,
+        violation_type: str,
+        s3_key: Optional[str] = None
+    ) -> "Future[Tuple[Optional[str], Optional[str]]]":
+        """
+        Queue upload_violation_image on the service's upload threads.
+
+        Returns:
+            Future resolving to (s3_url, s3_key), or (None, None) if failed
+        """
+        return self._executor.submit(
+            self.upload_violation_image,
+            image_bgr,
+            exam_period_id,
+            submission_id,
+            user_id,
+            violation_type,
+            s3_key
+        )
+
+    def shutdown(self) -> None:
+        """Wait for queued uploads, then release the upload threads."""
+        self._executor.shutdown(wait=True)
+
     def delete_violation_image(self, s3_key: str) -> bool:
         """
         Delete violation image from S3.
@@ -145,5 +247,58 @@ class S3Service:
             return False
 
 
-# Singleton instance
-s3_service = S3Service()
+def _key_for(
+    base: str,
+    exam_period_id: int,
+    submission_id: int,
+    user_id: int,
+    violation_type: str,
+    timestamp: str
+) -> str:
+    """Build the object key of a violation image from its parts."""
+    return _KEY_TMPL.format_map({
+        'base': base,
+        'eid': exam_period_id,
+        'sid': submission_id,
+        'uid': user_id,
+        'vt': violation_type,
+        'ts': timestamp,
+    })
+
+
+def _client_config() -> Config:
+    # Uploads run from a thread pool: keep enough pooled, kept-alive
+    # connections so each PUT reuses TCP + TLS.
+    options = dict(
+        signature_version='s3v4',
+        max_pool_connections=50,
+        tcp_keepalive=True,
+        retries={'max_attempts': 3, 'mode': 'standard'},
+    )
+    try:
+        # botocore >= 1.36 checksums every PutObject body (CRC32) by default;
+        # violation JPEGs are small in-memory buffers, skip the extra pass
+        return Config(request_checksum_calculation='when_required', **options)
+    except TypeError:  # older botocore: no default checksum to disable
+        return Config(**options)
+
+
+def _load_turbojpeg():
+    if TurboJPEG is None:
+        return None
+    try:
+        return TurboJPEG()
+    except (OSError, RuntimeError) as e:  # libturbojpeg shared library missing
+        LOGGER.warning(f"TurboJPEG unavailable, encoding with OpenCV: {e}")
+        return None
+
+
+@functools.lru_cache(maxsize=1)
+def get_s3_service() -> S3Service:
+    """
+    Return the shared S3Service, creating it on first use.
+
+    Building the boto3 client resolves credentials and config, which
+    importers that never upload (CLI scripts, checks) should not pay for.
+    """
+    return S3Service()
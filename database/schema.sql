@@ -38,7 +38,9 @@ CREATE TABLE IF NOT EXISTS violation_summary (
     low_count INT DEFAULT 0,
     first_violation_at DATETIME,
     last_violation_at DATETIME,
-    risk_score DECIMAL(5,2) DEFAULT 0.00 COMMENT 'Overall risk score 0-100',
+    risk_score DECIMAL(5,2) GENERATED ALWAYS AS (
+        critical_count * 50 + (high_count + medium_count + low_count) * 10
+    ) VIRTUAL COMMENT 'Overall risk score, computed from the counters',
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     INDEX idx_risk_score (risk_score),
     INDEX idx_exam_period (exam_period_id)
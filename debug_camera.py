@@ -1,9 +1,18 @@
 
+import time
+
 import cv2
 import numpy as np
 from cheating_detection import load_default_pipeline
 from cheating_detection.visualization import annotate_detections
 
+WINDOW_NAME = "Debug Camera - Head Pose"
+# Redraw the window at most ~20 fps; frames in between are analyzed only
+DISPLAY_INTERVAL = 0.05
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+POSE_TEXT_STYLE = (FONT, 0.6, (0, 255, 255), 2)
+FLAG_TEXT_STYLE = (FONT, 0.7, (0, 0, 255), 2)
+
 def main():
     print("Loading pipeline...")
     pipeline = load_default_pipeline()
@@ -14,6 +23,7 @@ def main():
         return
 
     print("Starting camera... Press 'q' to quit.")
+    last_display = 0.0
     
     while True:
         ret, frame = cap.read()
@@ -28,46 +38,52 @@ def main():
             print(f"Analysis failed: {e}")
             continue
 
+        # Keep the window responsive, but only draw/redraw when it is due
+        now = time.monotonic()
+        if now - last_display < DISPLAY_INTERVAL:
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+            continue
+        last_display = now
+
         # Draw basic annotations (faces, objects, labels)
-        annotated_frame = result.get("annotated_image", frame).copy()
+        # pipeline.analyze already draws on its own copy, so draw on it in place
+        annotated_frame = result.get("annotated_image")
+        if annotated_frame is None:
+            annotated_frame = frame
 
         # Extra: Draw raw Head Pose angles for debugging
         faces = result.get("faces", [])
-        for i, face in enumerate(faces):
-            pose = face.get("pose") # This is [pitch, yaw, roll] based on head_pose.py logic? 
+        for face in faces:
+            get = face.get
+            pose = get("pose") # This is [pitch, yaw, roll] based on head_pose.py logic? 
             # Note: head_pose.py: classify_sequence -> _ordered_pose(pose) -> zip(pose_order, values)
             # Default pose_order is ("pitch", "yaw", "roll").
             # InsightFace typically returns pose in [pitch, yaw, roll] degrees.
+            bbox = get("bbox")
             
-            if pose is not None and len(pose) == 3:
+            if pose is not None and len(pose) == 3 and bbox:
                 pitch, yaw, roll = pose
                 
-                # Create debug text for Head Pose
-                pose_text = f"Head P:{pitch:.1f} Y:{yaw:.1f} R:{roll:.1f}"
-                
                 # Get Gaze Metrics
-                gaze_metrics = face.get("gaze_metrics", {})
+                gaze_metrics = get("gaze_metrics") or {}
                 h_ratio = gaze_metrics.get("horizontal_ratio", 0.0)
                 v_ratio = gaze_metrics.get("vertical_ratio", 0.0)
-                gaze_text = f"Eye V:{v_ratio:.2f} H:{h_ratio:.2f}"
 
-                # Draw it near the face bbox
-                bbox = face.get("bbox")
-                if bbox:
-                    x1, y1, x2, y2 = [int(v) for v in bbox]
-                    # Draw above the standard label
-                    cv2.putText(annotated_frame, pose_text, (x1, y1 - 45), 
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
-                    cv2.putText(annotated_frame, gaze_text, (x1, y1 - 25), 
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+                # Head Pose and gaze on one line, drawn above the standard label
+                debug_text = (
+                    f"Head P:{pitch:.1f} Y:{yaw:.1f} R:{roll:.1f} | "
+                    f"Eye V:{v_ratio:.2f} H:{h_ratio:.2f}"
+                )
+                x1, y1 = int(bbox[0]), int(bbox[1])
+                cv2.putText(annotated_frame, debug_text, (x1, y1 - 25), *POSE_TEXT_STYLE)
 
         # Show status flags
         flags = result.get("flags", [])
         for idx, flag in enumerate(flags):
-            cv2.putText(annotated_frame, flag, (10, 30 + idx * 30), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+            cv2.putText(annotated_frame, flag, (10, 30 + idx * 30), *FLAG_TEXT_STYLE)
 
-        cv2.imshow("Debug Camera - Head Pose", annotated_frame)
+        cv2.imshow(WINDOW_NAME, annotated_frame)
 
         if cv2.waitKey(1) & 0xFF == ord('q'):
             break
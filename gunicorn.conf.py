@@ -0,0 +1,30 @@
+"""
+Gunicorn settings for the cheating detection API.
+
+Run with: gunicorn -c gunicorn.conf.py app:app
+"""
+
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8001")
+# One worker by default: the gthread threads below and the inference
+# MicroBatcher already provide concurrency, and FaceDatabase is designed for a
+# single writer. Extra workers each load a full pipeline (and GPU memory) and
+# serialize face database writes on a file lock, reloading each other's changes.
+workers = int(os.getenv("GUNICORN_WORKERS", "1"))
+# Threaded workers: while one thread runs inference (native code that releases
+# the GIL), others decode uploads and talk to MySQL/S3. gevent is avoided
+# because greenlets would stall behind the blocking native inference calls.
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+# Never preload: each worker must build its own models (and CUDA context)
+# after fork.
+preload_app = False
+
+
+def post_worker_init(worker):
+    """Build and warm up the pipeline before the worker accepts requests."""
+    from app import get_pipeline
+
+    get_pipeline()
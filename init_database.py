@@ -4,17 +4,27 @@ Initialize database schema for violations tracking
 """
 
 import os
+import re
+from itertools import groupby
 import pymysql
+import sqlparse
+from pymysql.constants import CLIENT
 from dotenv import load_dotenv
 
 load_dotenv()
 
+CREATE_TABLE_RE = re.compile(r'CREATE TABLE\s+(?:IF NOT EXISTS\s+)?`?(\w+)`?', re.IGNORECASE)
+
 # Read schema SQL
-with open('database/schema.sql', 'r') as f:
-    schema_sql = f.read()
+with open('database/schema.sql', 'rb') as f:
+    schema_sql = f.read().decode('utf-8')
 
-# Split into individual statements
-statements = [s.strip() for s in schema_sql.split(';') if s.strip()]
+# Split with a real SQL tokenizer (semicolons inside literals/comments are
+# safe). Only used for reporting: the whole script is sent in one round-trip.
+statements = [
+    sqlparse.format(s, strip_comments=True).strip() for s in sqlparse.split(schema_sql)
+]
+statements = [s for s in statements if s]
 
 try:
     # Connect to MySQL
@@ -23,7 +33,8 @@ try:
         port=int(os.getenv('MYSQL_PORT', 3306)),
         user=os.getenv('MYSQL_USER'),
         password=os.getenv('MYSQL_PASSWORD'),
-        database=os.getenv('MYSQL_DATABASE')
+        database=os.getenv('MYSQL_DATABASE'),
+        client_flag=CLIENT.MULTI_STATEMENTS
     )
     
     cursor = conn.cursor()
@@ -31,45 +42,61 @@ try:
     print(f"Connected to MySQL: {os.getenv('MYSQL_DATABASE')}")
     print(f"Executing {len(statements)} SQL statements...\n")
     
-    # Execute each statement
-    for i, statement in enumerate(statements, 1):
-        try:
-            cursor.execute(statement)
-            # Get table name from CREATE TABLE statement
-            if 'CREATE TABLE' in statement:
-                table_name = statement.split('CREATE TABLE')[1].split('(')[0].strip()
-                print(f"✓ [{i}/{len(statements)}] Created table: {table_name}")
+    # Execute the whole script at once; drain every statement's result set
+    try:
+        cursor.execute(schema_sql)
+        while cursor.nextset():
+            pass
+        for i, statement in enumerate(statements, 1):
+            match = CREATE_TABLE_RE.match(statement)
+            if match:
+                print(f"✓ [{i}/{len(statements)}] Created table: {match.group(1)}")
             else:
                 print(f"✓ [{i}/{len(statements)}] Executed statement")
-        except Exception as e:
-            print(f"✗ [{i}/{len(statements)}] Error: {e}")
+    except Exception as e:
+        print(f"✗ Error: {e}")
     
     conn.commit()
     
-    # Verify tables created
-    print("\nVerifying tables...")
-    cursor.execute("SHOW TABLES LIKE 'violations'")
-    if cursor.fetchone():
-        print("✓ violations table created")
-    
-    cursor.execute("SHOW TABLES LIKE 'violation_summary'")
-    if cursor.fetchone():
-        print("✓ violation_summary table created")
+    # Tables created before risk_score became a generated column still store it
+    cursor.execute("SHOW COLUMNS FROM violation_summary LIKE 'risk_score'")
+    column = cursor.fetchone()
+    if column and 'GENERATED' not in column[5].upper():
+        cursor.execute("""
+            ALTER TABLE violation_summary
+                DROP INDEX idx_risk_score,
+                DROP COLUMN risk_score,
+                ADD COLUMN risk_score DECIMAL(5,2) GENERATED ALWAYS AS (
+                    critical_count * 50 + (high_count + medium_count + low_count) * 10
+                ) VIRTUAL COMMENT 'Overall risk score, computed from the counters'
+                    AFTER last_violation_at,
+                ADD INDEX idx_risk_score (risk_score)
+        """)
+        print("✓ Migrated violation_summary.risk_score to a generated column")
     
-    # Show table structures
-    print("\n" + "="*60)
-    print("violations table structure:")
-    print("="*60)
-    cursor.execute("DESCRIBE violations")
-    for row in cursor.fetchall():
-        print(f"  {row[0]:20} {row[1]:20} {row[2]:8} {row[3]:8}")
+    # Verify tables created and show their structures in one round-trip.
+    # DATABASE() is the schema selected by schema.sql's USE statement.
+    print("\nVerifying tables...")
+    cursor.execute("""
+        SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE, COLUMN_KEY
+        FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE()
+          AND TABLE_NAME IN ('violations', 'violation_summary')
+        ORDER BY TABLE_NAME, ORDINAL_POSITION
+    """)
+    columns_by_table = {
+        table: list(rows) for table, rows in groupby(cursor.fetchall(), key=lambda r: r[0])
+    }
+    for table in ('violations', 'violation_summary'):
+        if table in columns_by_table:
+            print(f"✓ {table} table created")
     
-    print("\n" + "="*60)
-    print("violation_summary table structure:")
-    print("="*60)
-    cursor.execute("DESCRIBE violation_summary")
-    for row in cursor.fetchall():
-        print(f"  {row[0]:20} {row[1]:20} {row[2]:8} {row[3]:8}")
+    for table, rows in columns_by_table.items():
+        print("\n" + "="*60)
+        print(f"{table} table structure:")
+        print("="*60)
+        for _, column, column_type, nullable, key in rows:
+            print(f"  {column:20} {column_type:20} {nullable:8} {key:8}")
     
     cursor.close()
     conn.close()
@@ -5,9 +5,18 @@ Test the monitoring API endpoint
 
 import requests
 import json
+from requests.adapters import HTTPAdapter
 
 # API endpoint
 API_URL = "http://localhost:8000/api/monitor"
+# (connect, read) timeout in seconds; the server itself waits up to 10s
+# for inference and the violation insert
+TIMEOUT = (3, 30)
+
+# Pooled session, reused if the request is sent again (keep-alive)
+SESSION = requests.Session()
+SESSION.mount('http://', HTTPAdapter(pool_connections=10, pool_maxsize=50))
+SESSION.mount('https://', HTTPAdapter(pool_connections=10, pool_maxsize=50))
 
 # Test data
 test_image = "/Users/hoangtrung/Documents/doancheating/head_pose/faceset/Image108.jpg"
@@ -29,8 +38,8 @@ print(f"Data: {json.dumps(data, indent=2)}")
 try:
     # Open and send image
     with open(test_image, 'rb') as f:
-        files = {'image': ('test.jpg', f, 'image/jpeg')}
-        response = requests.post(API_URL, data=data, files=files)
+        files = {'file': ('test.jpg', f, 'image/jpeg')}
+        response = SESSION.post(API_URL, data=data, files=files, timeout=TIMEOUT)
     
     print(f"\nStatus Code: {response.status_code}")
     
@@ -5,6 +5,8 @@ Quick setup test for exam monitoring system
 
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 def check_dependencies():
     """Check if all required packages are installed"""
@@ -78,46 +80,45 @@ def check_env_file():
     return True
 
 
-def check_s3_connection():
-    """Test S3 connection"""
-    print("Testing S3 connection...")
+def check_s3_connection(log=print):
+    """Test S3 connection (`log` receives each output line)"""
+    log("Testing S3 connection...")
     
     try:
-        from database.config import S3Config
+        from database.config import s3_config as config
         import boto3
         
-        config = S3Config.from_env()
         s3_client = boto3.client(
             's3',
             region_name=config.region,
-            aws_access_key_id=config.access_key_id,
-            aws_secret_access_key=config.secret_access_key
+            aws_access_key_id=config.access_key,
+            aws_secret_access_key=config.secret_key,
+            endpoint_url=config.endpoint_url
         )
         
         # Try to check if bucket exists
         s3_client.head_bucket(Bucket=config.bucket_name)
-        print(f"✓ S3 bucket '{config.bucket_name}' accessible\n")
+        log(f"✓ S3 bucket '{config.bucket_name}' accessible\n")
         return True
         
     except Exception as e:
-        print(f"✗ S3 connection failed: {str(e)}")
-        print("Make sure:")
-        print("  1. AWS credentials are correct")
-        print("  2. S3 bucket exists")
-        print("  3. Bucket region matches AWS_REGION")
-        print(f"\nCreate bucket with: aws s3 mb s3://{os.getenv('S3_BUCKET_NAME', 'your-bucket')} --region {os.getenv('AWS_REGION', 'ap-southeast-1')}\n")
+        log(f"✗ S3 connection failed: {str(e)}")
+        log("Make sure:")
+        log("  1. AWS credentials are correct")
+        log("  2. S3 bucket exists")
+        log("  3. Bucket region matches AWS_REGION")
+        log(f"\nCreate bucket with: aws s3 mb s3://{os.getenv('S3_BUCKET_NAME', 'your-bucket')} --region {os.getenv('AWS_REGION', 'ap-southeast-1')}\n")
         return False
 
 
-def check_mysql_connection():
-    """Test MySQL connection"""
-    print("Testing MySQL connection...")
+def check_mysql_connection(log=print):
+    """Test MySQL connection (`log` receives each output line)"""
+    log("Testing MySQL connection...")
     
     try:
-        from database.config import MySQLConfig
+        from database.config import mysql_config as config
         import pymysql
         
-        config = MySQLConfig.from_env()
         connection = pymysql.connect(
             host=config.host,
             port=config.port,
@@ -138,68 +139,104 @@ def check_mysql_connection():
         connection.close()
         
         if not violations_table or not summary_table:
-            print("✗ Database tables not found")
-            print("Initialize database with: mysql -u root -p < database/schema.sql\n")
+            log("✗ Database tables not found")
+            log("Initialize database with: mysql -u root -p < database/schema.sql\n")
             return False
         
-        print(f"✓ MySQL database '{config.database}' accessible")
-        print("✓ Required tables exist\n")
+        log(f"✓ MySQL database '{config.database}' accessible")
+        log("✓ Required tables exist\n")
         return True
         
     except Exception as e:
-        print(f"✗ MySQL connection failed: {str(e)}")
-        print("Make sure:")
-        print("  1. MySQL is running")
-        print("  2. Database exists: CREATE DATABASE exam_system;")
-        print("  3. Schema is loaded: mysql -u root -p exam_system < database/schema.sql\n")
+        log(f"✗ MySQL connection failed: {str(e)}")
+        log("Make sure:")
+        log("  1. MySQL is running")
+        log("  2. Database exists: CREATE DATABASE exam_system;")
+        log("  3. Schema is loaded: mysql -u root -p exam_system < database/schema.sql\n")
         return False
 
 
-def check_face_database():
-    """Check if face database has registered students"""
-    print("Checking face database...")
+@lru_cache(maxsize=1)
+def _count_students():
+    """Count registered students once per process"""
+    from pathlib import Path
+    from cheating_detection.face_database import count_identities
+    
+    # Same file FaceRecognizer loads by default
+    return count_identities(
+        Path(__file__).resolve().parent / "Face_Recognition_Training" / "models" / "face_database_kaggle.pkl"
+    )
+
+
+def check_face_database(log=print):
+    """Check if face database has registered students (`log` receives each output line)"""
+    log("Checking face database...")
     
     try:
-        from cheating_detection.face_database import FaceDatabase
-        
-        db = FaceDatabase()
-        students = db.list_students()
+        students = _count_students()
         
         if not students:
-            print("⚠ No students registered")
-            print("Register at least one student to test verification:")
-            print("  POST /api/students with student_id, name, class, image\n")
+            log("⚠ No students registered")
+            log("Register at least one student to test verification:")
+            log("  POST /api/students with student_id, name, class, image\n")
         else:
-            print(f"✓ {len(students)} student(s) registered\n")
+            log(f"✓ {students} student(s) registered\n")
         
         return True
         
     except Exception as e:
-        print(f"✗ Failed to check face database: {str(e)}\n")
+        log(f"✗ Failed to check face database: {str(e)}\n")
         return False
 
 
+def run_check(name, check_func):
+    """Run one check, returning (name, passed)"""
+    try:
+        return name, check_func()
+    except Exception as e:
+        print(f"✗ {name} check failed with error: {str(e)}\n")
+        return name, False
+
+
+def run_collected(name, check_func):
+    """Run one check in a worker thread, returning (name, passed, lines)"""
+    lines = []
+    try:
+        passed = check_func(log=lines.append)
+    except Exception as e:
+        lines.append(f"✗ {name} check failed with error: {str(e)}\n")
+        passed = False
+    return name, passed, lines
+
+
 def main():
     """Run all setup checks"""
     print("=" * 60)
     print("Exam Monitoring System - Setup Test")
     print("=" * 60 + "\n")
     
-    checks = [
+    # Dependencies and environment gate the rest, so they run first
+    serial_checks = [
         ("Dependencies", check_dependencies),
         ("Environment", check_env_file),
+    ]
+    # Independent, network/disk bound checks run concurrently; they collect
+    # their output lines, printed here in order once all are done
+    parallel_checks = [
         ("S3 Connection", check_s3_connection),
         ("MySQL Connection", check_mysql_connection),
         ("Face Database", check_face_database),
     ]
     
-    results = {}
-    for name, check_func in checks:
-        try:
-            results[name] = check_func()
-        except Exception as e:
-            print(f"✗ {name} check failed with error: {str(e)}\n")
-            results[name] = False
+    results = dict(run_check(name, check_func) for name, check_func in serial_checks)
+    
+    with ThreadPoolExecutor(max_workers=len(parallel_checks)) as executor:
+        outcomes = list(executor.map(lambda check: run_collected(*check), parallel_checks))
+    
+    for name, passed, lines in outcomes:
+        for line in lines:
+            print(line)
+        results[name] = passed
     
     print("=" * 60)
     print("Setup Summary")
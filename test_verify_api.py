@@ -2,13 +2,27 @@
 Test script for student verification API.
 """
 
-import base64
+import os
 import sys
 
 import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    # Streams multipart bodies from disk; requests' files= builds them in memory
+    from requests_toolbelt import MultipartEncoder
+except ImportError:
+    MultipartEncoder = None
 
 
 BASE_URL = "http://localhost:8000"
+# (connect, read) timeout in seconds
+TIMEOUT = (3, 10)
+
+# One pooled session so every test case reuses the same TCP/TLS connection
+SESSION = requests.Session()
+SESSION.mount('http://', HTTPAdapter(pool_connections=10, pool_maxsize=50))
+SESSION.mount('https://', HTTPAdapter(pool_connections=10, pool_maxsize=50))
 
 
 def verify_student(student_id: str, image_path: str, threshold: float = 0.5):
@@ -29,25 +43,33 @@ def verify_student(student_id: str, image_path: str, threshold: float = 0.5):
     print(f"Threshold: {threshold}")
     print(f"{'='*60}")
     
-    # Read and encode image
+    # Send verification request as multipart (no base64 inflation of the JPEG)
     try:
         with open(image_path, 'rb') as f:
-            image_base64 = base64.b64encode(f.read()).decode('utf-8')
+            image = (os.path.basename(image_path), f, 'image/jpeg')
+            fields = {
+                'student_id': student_id,
+                'threshold': str(threshold)
+            }
+            if MultipartEncoder is not None:
+                # Read the file in chunks while sending instead of buffering it
+                body = MultipartEncoder(fields={**fields, 'file': image})
+                response = SESSION.post(
+                    f'{BASE_URL}/api/students/verify',
+                    data=body,
+                    headers={'Content-Type': body.content_type},
+                    timeout=TIMEOUT
+                )
+            else:
+                response = SESSION.post(
+                    f'{BASE_URL}/api/students/verify',
+                    files={'file': image},
+                    data=fields,
+                    timeout=TIMEOUT
+                )
     except FileNotFoundError:
         print(f"❌ Error: Image file not found: {image_path}")
         return False
-    
-    # Send verification request
-    try:
-        response = requests.post(
-            f'{BASE_URL}/api/students/verify',
-            json={
-                'student_id': student_id,
-                'image': image_base64,
-                'threshold': threshold
-            },
-            timeout=10
-        )
     except requests.exceptions.RequestException as e:
         print(f"❌ Error: Failed to connect to server: {e}")
         return False
@@ -87,16 +109,16 @@ def verify_with_file(student_id: str, image_path: str, threshold: float = 0.5):
     
     try:
         with open(image_path, 'rb') as f:
-            files = {'image': f}
+            files = {'file': f}
             data = {
                 'student_id': student_id,
                 'threshold': str(threshold)
             }
-            response = requests.post(
+            response = SESSION.post(
                 f'{BASE_URL}/api/students/verify',
                 files=files,
                 data=data,
-                timeout=10
+                timeout=TIMEOUT
             )
     except FileNotFoundError:
         print(f"❌ Error: Image file not found: {image_path}")
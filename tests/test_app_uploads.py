@@ -0,0 +1,68 @@
+"""
+Tests for decoding multipart uploads through the Flask app.
+"""
+
+import io
+
+import cv2
+import numpy as np
+import pytest
+
+import app as app_module
+from cheating_detection import utils
+
+
+class _FakePipeline:
+    def __init__(self):
+        self.images = []
+
+    def analyze(self, image):
+        self.images.append(image)
+        return {"status": "clear", "flags": [], "faces": []}
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    pipeline = _FakePipeline()
+    monkeypatch.setattr(app_module, "get_pipeline", lambda: pipeline)
+    monkeypatch.setattr(app_module, "_persist_annotated_image", lambda *args: "annotated.jpg")
+    return pipeline
+
+
+@pytest.fixture
+def decoded_types(monkeypatch):
+    types = []
+    decode = utils.decode_image_from_bytes
+
+    def spy(content):
+        types.append(type(content))
+        return decode(content)
+
+    monkeypatch.setattr(utils, "decode_image_from_bytes", spy)
+    return types
+
+
+@pytest.mark.parametrize(
+    "side, buffer_type",
+    [
+        # Spooled in memory (< 500 KB): decoded from the BytesIO buffer
+        (64, memoryview),
+        # Rolled over to a temporary file: read into a preallocated array
+        (800, np.ndarray),
+    ],
+)
+def test_detect_decodes_upload_without_bytes_copy(pipeline, decoded_types, side, buffer_type):
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, (side, side, 3), dtype=np.uint8)
+    success, png = cv2.imencode(".png", image)
+    assert success
+
+    response = app_module.app.test_client().post(
+        "/api/detect",
+        data={"file": (io.BytesIO(png.tobytes()), "frame.png")},
+        content_type="multipart/form-data",
+    )
+
+    assert response.status_code == 200
+    assert decoded_types == [buffer_type]
+    np.testing.assert_array_equal(pipeline.images[0], image)
@@ -0,0 +1,103 @@
+"""
+Tests for the memory-mapped FaceDatabase storage.
+"""
+
+import numpy as np
+import pytest
+
+from cheating_detection import face_database
+from cheating_detection.face_database import FaceDatabase
+
+DIMENSION = 512
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(0)
+    return rng.standard_normal((16, DIMENSION)).astype(np.float32)
+
+
+@pytest.fixture
+def database_path(tmp_path):
+    return tmp_path / "models" / "face_database.pkl"
+
+
+def _assert_identifies(database, expected):
+    for name, vector in expected.items():
+        match, score = database.identify(vector)
+        assert match == name
+        assert score == pytest.approx(1.0, abs=1e-2)
+
+
+def test_append_persists_rows(database_path, vectors):
+    database = FaceDatabase(database_path)
+    database.add_person("Alice", [vectors[0]], student_id="SV001")
+    database.add_person("Bob", [vectors[1]], student_id="SV002")
+
+    _assert_identifies(database, {"Alice": vectors[0], "Bob": vectors[1]})
+    reopened = FaceDatabase(database_path)
+    _assert_identifies(reopened, {"Alice": vectors[0], "Bob": vectors[1]})
+    assert reopened.find_by_student_id("SV002") == "Bob"
+
+
+def test_delete_moves_last_rows_into_gap(database_path, vectors):
+    database = FaceDatabase(database_path)
+    database.add_person("Alice", vectors[0:3])
+    database.add_person("Bob", [vectors[3]])
+    database.add_person("Carol", vectors[4:6])
+
+    assert database.delete_person("Alice")
+    assert not database.has_person("Alice")
+    expected = {"Bob": vectors[3], "Carol": vectors[4]}
+    _assert_identifies(database, expected)
+    _assert_identifies(FaceDatabase(database_path), expected)
+    assert len(database._names) == 3
+
+
+def test_readding_person_replaces_prototypes(database_path, vectors):
+    database = FaceDatabase(database_path)
+    database.add_person("Alice", [vectors[0]])
+    database.add_person("Bob", [vectors[1]])
+    database.add_person("Alice", [vectors[2]])
+
+    assert database._names.count("Alice") == 1
+    _assert_identifies(FaceDatabase(database_path), {"Alice": vectors[2], "Bob": vectors[1]})
+
+
+def test_grow_past_capacity(database_path, vectors, monkeypatch):
+    monkeypatch.setattr(face_database, "INITIAL_CAPACITY", 2)
+    database = FaceDatabase(database_path)
+    expected = {f"Person {i}": vectors[i] for i in range(7)}
+    for name, vector in expected.items():
+        database.add_person(name, [vector])
+
+    assert np.load(database.matrix_path, mmap_mode="r").shape[0] >= len(expected)
+    _assert_identifies(database, expected)
+    _assert_identifies(FaceDatabase(database_path), expected)
+
+
+def test_instances_sharing_files_keep_each_others_rows(database_path, vectors):
+    first = FaceDatabase(database_path)
+    second = FaceDatabase(database_path)
+    first.add_person("Alice", [vectors[0]])
+    # Without reloading, this would write Bob over Alice's row 0
+    second.add_person("Bob", [vectors[1]])
+    first.add_person("Carol", [vectors[2]])
+    second.delete_person("Alice")
+
+    expected = {"Bob": vectors[1], "Carol": vectors[2]}
+    _assert_identifies(first, expected)
+    _assert_identifies(second, expected)
+    _assert_identifies(FaceDatabase(database_path), expected)
+    assert not first.has_person("Alice")
+
+
+def test_count_identities_reads_files_without_writing(database_path, vectors):
+    assert face_database.count_identities(database_path) == 0
+    database = FaceDatabase(database_path)
+    database.add_person("Alice", vectors[0:3])
+    database.add_person("Bob", [vectors[3]])
+
+    files = sorted(database_path.parent.iterdir())
+    assert face_database.count_identities(database_path) == 2
+    assert sorted(database_path.parent.iterdir()) == files